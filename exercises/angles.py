@@ -0,0 +1,97 @@
+import json
+from numbers import Number
+
+from .models import ExerciseJointAngle
+
+
+def _to_float(value):
+    if isinstance(value, bool) or not isinstance(value, Number):
+        return None
+    return float(value)
+
+
+def _parse_angle(value):
+    # Devuelve (objetivo, tolerancia) para un valor de ideal_angles o None si no se entiende
+    number = _to_float(value)
+    if number is not None:
+        return number, 0.0
+
+    if not isinstance(value, dict):
+        return None
+
+    for key in ('target', 'ideal', 'angle', 'objetivo', 'angulo'):
+        target = _to_float(value.get(key))
+        if target is not None:
+            tolerance = _to_float(value.get('tolerance', value.get('tolerancia'))) or 0.0
+            return target, abs(tolerance)
+
+    low = _to_float(value.get('min'))
+    high = _to_float(value.get('max'))
+    if low is not None and high is not None:
+        return (low + high) / 2, abs(high - low) / 2
+
+    return None
+
+
+# Llaves que marcan la articulación principal (la que se usa para contar repeticiones)
+PRIMARY_KEYS = ('primary', 'principal')
+
+
+def parse_ideal_angles(ideal_angles):
+    """
+    Normaliza ideal_angles a {articulación: (objetivo, tolerancia)}.
+    Acepta un objeto {"rodilla": 90}, {"rodilla": {"target": 90, "tolerance": 10}},
+    {"rodilla": {"min": 80, "max": 100}} o una lista de objetos con la llave "joint".
+    Las entradas que no se pueden interpretar se ignoran.
+
+    La primera articulación del resultado es la principal:
+    - en un objeto, la que indique la llave "primary" (o "principal"); si no hay, la primera
+      en orden alfabético, porque jsonb no conserva el orden de las llaves;
+    - en una lista, la que tenga "primary": true o, si ninguna, la primera de la lista.
+    """
+    # Con multipart el JSON puede llegar guardado como texto
+    if isinstance(ideal_angles, str):
+        try:
+            ideal_angles = json.loads(ideal_angles)
+        except ValueError:
+            return {}
+
+    primary = None
+    if isinstance(ideal_angles, list):
+        items = [
+            (item.get('joint'), item)
+            for item in ideal_angles
+            if isinstance(item, dict)
+        ]
+        primary = next((joint for joint, item in items if item.get('primary') is True), None)
+    elif isinstance(ideal_angles, dict):
+        items = sorted(
+            (item for item in ideal_angles.items() if item[0] not in PRIMARY_KEYS),
+            key=lambda item: str(item[0]).strip().lower()
+        )
+        primary = next((ideal_angles[key] for key in PRIMARY_KEYS if key in ideal_angles), None)
+    else:
+        return {}
+
+    angles = {}
+    for joint, value in items:
+        if not isinstance(joint, str) or not joint.strip():
+            continue
+
+        parsed = _parse_angle(value)
+        if parsed is not None:
+            angles[joint.strip().lower()[:50]] = parsed
+
+    if isinstance(primary, str) and primary.strip().lower()[:50] in angles:
+        primary = primary.strip().lower()[:50]
+        angles = {primary: angles.pop(primary), **angles}
+    return angles
+
+
+def sync_joint_angles(exercise):
+    # Reemplaza las filas de ángulos del ejercicio por las de su ideal_angles actual
+    ExerciseJointAngle.objects.filter(exercise=exercise).delete()
+    ExerciseJointAngle.objects.bulk_create([
+        ExerciseJointAngle(exercise=exercise, joint=joint, target=target, tolerance=tolerance)
+        for joint, (target, tolerance) in parse_ideal_angles(exercise.ideal_angles).items()
+    ])
@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class ExercisesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'exercises'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from .cache import catalog_changed
+        from .models import Exercise
+
+        # Cualquier cambio en el catálogo invalida las respuestas en cache
+        post_save.connect(catalog_changed, sender=Exercise, dispatch_uid='exercise_catalog_saved')
+        post_delete.connect(catalog_changed, sender=Exercise, dispatch_uid='exercise_catalog_deleted')
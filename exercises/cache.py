@@ -0,0 +1,170 @@
+import functools
+import hashlib
+import threading
+import time
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+CATALOG_VERSION_KEY = 'exercises:catalog_version'
+
+# Segundos que una respuesta se considera fresca si el catálogo no cambia
+DEFAULT_TIMEOUT = 300
+# Segundos que se conserva una respuesta vieja para servirla mientras otro la recalcula
+STALE_TIMEOUT = 3600
+# Tiempo máximo que alguien puede tener el candado de recálculo de una llave
+LOCK_TIMEOUT = 30
+# Tiempo que espera quien no obtuvo el candado y no tiene respuesta vieja que servir
+WAIT_TIMEOUT = 2.0
+WAIT_INTERVAL = 0.05
+
+_stats = {'hits': 0, 'stale': 0, 'misses': 0, 'bypassed': 0, 'recomputes': 0, 'recompute_seconds': 0.0}
+_stats_lock = threading.Lock()
+
+
+def _record(**increments):
+    with _stats_lock:
+        for name, value in increments.items():
+            _stats[name] += value
+
+
+def get_cache_stats():
+    # Métricas del proceso actual
+    with _stats_lock:
+        stats = dict(_stats)
+
+    served = stats['hits'] + stats['stale'] + stats['misses']
+    stats['hit_ratio'] = round((stats['hits'] + stats['stale']) / served, 4) if served else None
+    stats['avg_recompute_ms'] = (
+        round(stats['recompute_seconds'] * 1000 / stats['recomputes'], 2) if stats['recomputes'] else None
+    )
+    stats['catalog_version'] = get_catalog_version()
+    return stats
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, 1, timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY, 1)
+    return version
+
+
+def bump_catalog_version():
+    # Invalida todas las respuestas en cache; se llama cuando cambia el catálogo
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.add(CATALOG_VERSION_KEY, 2, timeout=None)
+
+
+def catalog_changed(sender, **kwargs):
+    # Receptor de post_save/post_delete; la versión se incrementa solo cuando la transacción se confirma
+    # para que nadie guarde en cache datos a medio escribir con la versión nueva
+    transaction.on_commit(bump_catalog_version)
+
+
+# Filtros que son conjuntos: el orden y los repetidos no cambian el resultado
+SET_PARAMS = {'muscle_group', 'difficulty', 'equipment', 'joint', 'exercise'}
+
+
+def _normalize_params(query_params):
+    # Mismos filtros en distinto orden producen la misma llave; el resto de los
+    # parámetros (ordering, name, fields...) se conservan tal cual y en su orden
+    normalized = []
+    for name in sorted(query_params.keys()):
+        raw_values = query_params.getlist(name)
+        if name in SET_PARAMS:
+            values = set()
+            for value in raw_values:
+                values.update(v.strip() for v in value.split(',') if v.strip())
+            raw_values = [','.join(sorted(values))]
+        normalized.extend((name, value) for value in raw_values)
+    # urlencode escapa los valores, así un '&' dentro de un valor no se confunde con otro parámetro
+    return urlencode(normalized)
+
+
+def _cache_key(name, request):
+    digest = hashlib.md5(_normalize_params(request.query_params).encode('utf-8')).hexdigest()
+    return f'exercises:response:{name}:{digest}'
+
+
+def is_shared_cache():
+    # Una cache local del proceso no se entera de las escrituras hechas en otros workers
+    return not isinstance(cache, (LocMemCache, DummyCache))
+
+
+def _cached(data, state):
+    response = Response(data)
+    response['X-Cache'] = state
+    return response
+
+
+def cached_response(name, request, compute, timeout=DEFAULT_TIMEOUT):
+    """
+    Devuelve la respuesta en cache para la vista y los filtros de la petición.
+    Solo un proceso recalcula cada llave a la vez; los demás reciben la respuesta
+    vieja (si existe) o esperan a que el primero termine.
+    Si la cache no es compartida entre procesos la respuesta siempre se calcula.
+    """
+    if not is_shared_cache():
+        _record(bypassed=1)
+        response = compute()
+        response['X-Cache'] = 'BYPASS'
+        return response
+
+    key = _cache_key(name, request)
+    version = get_catalog_version()
+    entry = cache.get(key)
+
+    if entry and entry['version'] == version and entry['expires'] > time.time():
+        _record(hits=1)
+        return _cached(entry['data'], 'HIT')
+
+    lock_key = f'{key}:lock'
+    if not cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+        if entry:
+            _record(stale=1)
+            return _cached(entry['data'], 'STALE')
+
+        # Esperar a que quien tiene el candado guarde la respuesta
+        deadline = time.monotonic() + WAIT_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(WAIT_INTERVAL)
+            entry = cache.get(key)
+            if entry and entry['version'] == version:
+                _record(hits=1)
+                return _cached(entry['data'], 'HIT')
+        lock_key = None
+
+    try:
+        started = time.perf_counter()
+        response = compute()
+        _record(misses=1, recomputes=1, recompute_seconds=time.perf_counter() - started)
+
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(
+                key,
+                {'version': version, 'expires': time.time() + timeout, 'data': response.data},
+                timeout=STALE_TIMEOUT
+            )
+        response['X-Cache'] = 'MISS'
+        return response
+    finally:
+        if lock_key:
+            cache.delete(lock_key)
+
+
+def cached_view(name, timeout=DEFAULT_TIMEOUT):
+    # Decorador para las vistas de función de solo lectura
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return cached_response(name, request, lambda: view(request, *args, **kwargs), timeout)
+        return wrapper
+    return decorator
@@ -0,0 +1,90 @@
+import json
+import uuid
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Exercise
+
+# Columnas del catálogo en el orden en que se exportan
+CATALOG_FIELDS = [
+    'id',
+    'name',
+    'muscle_group',
+    'secondary_muscles',
+    'difficulty',
+    'equipment',
+    'image',
+    'ideal_angles',
+    'common_mistakes',
+    'is_active',
+    'created_at',
+    'updated_at',
+]
+
+JSON_FIELDS = ['secondary_muscles', 'ideal_angles', 'common_mistakes']
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return 'csv' if str(path).lower().endswith('.csv') else 'jsonl'
+
+
+def encode_row(values, fmt):
+    # Convierte una fila de values_list en un dict listo para escribir como JSONL o CSV
+    row = dict(zip(CATALOG_FIELDS, values))
+    row['id'] = str(row['id'])
+    row['image'] = Exercise._meta.get_field('image').get_prep_value(row['image']) or None
+    row['created_at'] = row['created_at'].isoformat()
+    row['updated_at'] = row['updated_at'].isoformat()
+
+    if fmt == 'csv':
+        for field in JSON_FIELDS:
+            row[field] = json.dumps(row[field], ensure_ascii=False)
+        row['image'] = row['image'] or ''
+    return row
+
+
+def _decode_bool(value):
+    if isinstance(value, bool):
+        return value
+
+    text = str(value).strip().lower()
+    if text in ('true', '1', 'yes', 'si', 'sí'):
+        return True
+    if text in ('false', '0', 'no'):
+        return False
+    raise ValueError(f'is_active no es un booleano: {value!r}')
+
+
+def _decode_datetime(value, field):
+    if value in (None, ''):
+        return None
+
+    parsed = parse_datetime(str(value))
+    if parsed is None:
+        raise ValueError(f'{field} no es una fecha válida: {value!r}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.utc)
+    return parsed
+
+
+def decode_row(row, fmt):
+    """
+    Convierte una fila leída de JSONL o CSV a los tipos de Python.
+    Lanza ValueError si el id, is_active, las fechas o alguna columna JSON no son válidos.
+    """
+    row = dict(row)
+
+    if fmt == 'csv':
+        for field in JSON_FIELDS:
+            value = row.get(field)
+            row[field] = json.loads(value) if value not in (None, '') else None
+        row['image'] = row.get('image') or None
+
+    row['id'] = uuid.UUID(str(row['id']))
+    row['is_active'] = _decode_bool(row['is_active']) if row.get('is_active') not in (None, '') else True
+    for field in ('created_at', 'updated_at'):
+        row[field] = _decode_datetime(row.get(field), field)
+    return row
@@ -0,0 +1,182 @@
+import hashlib
+import io
+import logging
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.request import urlopen
+
+from cloudinary import uploader
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils.module_loading import import_string
+from PIL import Image
+
+from .models import Exercise, ImageAsset
+
+logger = logging.getLogger(__name__)
+
+# Lado máximo (px) de las miniaturas que se generan para cada imagen nueva
+THUMBNAIL_SIZES = (320, 96)
+
+
+class ImageStorage:
+    """
+    Interfaz de almacenamiento de imágenes de ejercicios.
+    save() guarda el contenido de un archivo abierto y devuelve el valor que se asigna a Exercise.image.
+    open() devuelve un archivo con el contenido guardado bajo ese valor.
+    """
+
+    def save(self, name, file, extension):
+        raise NotImplementedError
+
+    def open(self, stored):
+        raise NotImplementedError
+
+
+class CloudinaryImageStorage(ImageStorage):
+    # Usa el hash como public_id, así la misma imagen siempre tiene el mismo nombre en Cloudinary
+    def save(self, name, file, extension):
+        resource = uploader.upload_resource(
+            file,
+            folder='exercises/',
+            public_id=name,
+            resource_type='image',
+            overwrite=False
+        )
+        return resource.get_prep_value()
+
+    def open(self, stored):
+        url = Exercise._meta.get_field('image').to_python(stored).url
+        with urlopen(url, timeout=30) as response:
+            return io.BytesIO(response.read())
+
+
+class FileSystemImageStorage(ImageStorage):
+    # Guarda los archivos en disco; pensado para pruebas y desarrollo local
+    def __init__(self, location=None):
+        self.location = Path(location or getattr(settings, 'EXERCISE_IMAGE_ROOT', None) or settings.BASE_DIR / 'media')
+
+    def save(self, name, file, extension):
+        relative = f'exercises/{name}.{extension}'
+        path = self.location / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'wb') as destination:
+            shutil.copyfileobj(file, destination)
+        return relative
+
+    def open(self, stored):
+        return open(self.location / stored, 'rb')
+
+
+def get_image_storage():
+    storage_class = getattr(settings, 'EXERCISE_IMAGE_STORAGE', 'exercises.images.CloudinaryImageStorage')
+    return import_string(storage_class)()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    # Pillow libera el GIL al redimensionar, así que un pool de hilos aprovecha varios núcleos
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'EXERCISE_IMAGE_WORKERS', 2),
+                thread_name_prefix='exercise-images'
+            )
+        return _executor
+
+
+def hash_upload(upload):
+    # Calcula el SHA-256 leyendo el archivo por partes, sin cargarlo completo en memoria
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    return digest.hexdigest()
+
+
+def generate_thumbnails(sha256, stored):
+    """
+    Genera las miniaturas WEBP de una imagen guardada y las registra en su ImageAsset.
+    store_image la manda al pool de hilos después de confirmar la transacción; la imagen
+    se vuelve a leer del almacenamiento para no mantener el archivo subido en memoria.
+    """
+    try:
+        storage = get_image_storage()
+        thumbnails = {}
+
+        with storage.open(stored) as file, Image.open(file) as image:
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA')
+
+            for size in THUMBNAIL_SIZES:
+                thumbnail = image.copy()
+                thumbnail.thumbnail((size, size))
+                buffer = io.BytesIO()
+                thumbnail.save(buffer, 'WEBP', quality=80)
+                buffer.seek(0)
+                thumbnails[str(size)] = storage.save(f'{sha256}_{size}', buffer, 'webp')
+
+        ImageAsset.objects.filter(sha256=sha256).update(thumbnails=thumbnails)
+        return thumbnails
+    except Exception:
+        logger.exception("No se pudieron generar las miniaturas de %s", sha256)
+
+
+def _thumbnail_job(sha256, stored):
+    try:
+        generate_thumbnails(sha256, stored)
+    finally:
+        # Cada hilo del pool tiene su propia conexión a la base de datos
+        connection.close()
+
+
+def _image_info(upload):
+    # El ImageField de DRF ya abrió y verificó la imagen con Pillow; se reutiliza ese resultado
+    image = getattr(upload, 'image', None)
+    if image is None:
+        # Image.open solo lee el encabezado
+        with Image.open(upload) as image:
+            info = image.size, image.format
+        upload.seek(0)
+        return info
+    return image.size, image.format
+
+
+def store_image(upload):
+    """
+    Guarda la imagen subida o reutiliza la existente con el mismo contenido.
+    Devuelve el valor que se asigna a Exercise.image.
+    Debe llamarse fuera de transacciones: la subida al almacenamiento puede tardar.
+    """
+    sha256 = hash_upload(upload)
+    image_field = Exercise._meta.get_field('image')
+
+    asset = ImageAsset.objects.filter(sha256=sha256).first()
+    if asset:
+        return image_field.to_python(asset.stored)
+
+    # El archivo se pasa al almacenamiento sin leerlo completo en memoria
+    (width, height), image_format = _image_info(upload)
+    stored = get_image_storage().save(sha256, upload, (image_format or 'png').lower())
+
+    try:
+        with transaction.atomic():
+            ImageAsset.objects.create(
+                sha256=sha256,
+                stored=stored,
+                size=upload.size,
+                width=width,
+                height=height
+            )
+    except IntegrityError:
+        # Otra petición guardó la misma imagen al mismo tiempo
+        return image_field.to_python(ImageAsset.objects.get(sha256=sha256).stored)
+
+    transaction.on_commit(lambda: _get_executor().submit(_thumbnail_job, sha256, stored))
+    return image_field.to_python(stored)
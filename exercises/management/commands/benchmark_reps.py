@@ -0,0 +1,38 @@
+import math
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from exercises.reps import RepCounter, count_reps
+
+
+class Command(BaseCommand):
+    help = 'Mide cuántos frames por segundo procesa el contador de repeticiones en un núcleo.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--frames', type=int, default=1_000_000)
+        parser.add_argument('--fps', type=float, default=30.0)
+        parser.add_argument('--rep-seconds', type=float, default=3.0)
+
+    def handle(self, *args, **options):
+        frames = options['frames']
+        fps = options['fps']
+        period = options['rep_seconds'] * fps
+
+        # Sentadillas sintéticas: rodilla entre 175° y 85° con ruido
+        rng = random.Random(0)
+        angles = [
+            130 + 45 * math.cos(2 * math.pi * i / period) + rng.gauss(0, 2)
+            for i in range(frames)
+        ]
+
+        counter = RepCounter(target=90, tolerance=10)
+        started = time.perf_counter()
+        reps = count_reps(angles, fps=fps, counter=counter)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f'{frames} frames en {elapsed:.3f}s: {frames / elapsed:,.0f} frames/s, '
+            f'{len(reps)} repeticiones (esperadas ~{int(frames / period)})'
+        )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from exercises.telemetry import create_monthly_partitions
+
+
+class Command(BaseCommand):
+    help = 'Crea las particiones mensuales de la tabla de resultados de repeticiones (PostgreSQL).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3)
+
+    def handle(self, *args, **options):
+        created = create_monthly_partitions(months_ahead=options['months_ahead'])
+        if not created:
+            self.stdout.write('La base de datos no soporta particiones, no se creó ninguna.')
+            return
+
+        for name in created:
+            self.stdout.write(f'Partición lista: {name}')
@@ -0,0 +1,51 @@
+import csv
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from exercises.catalog_io import CATALOG_FIELDS, detect_format, encode_row
+from exercises.models import Exercise
+
+
+class Command(BaseCommand):
+    help = 'Exporta el catálogo de ejercicios a JSONL o CSV leyendo con un cursor del servidor.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="Archivo de salida o '-' para stdout")
+        parser.add_argument('--format', choices=['jsonl', 'csv'])
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--only-active', action='store_true')
+
+    def handle(self, *args, **options):
+        fmt = detect_format(options['output'], options['format'])
+
+        queryset = Exercise.objects.order_by()
+        if options['only_active']:
+            queryset = queryset.filter(is_active=True)
+
+        # iterator() usa un cursor del servidor en PostgreSQL, la memoria no crece con el tamaño de la tabla
+        rows = queryset.values_list(*CATALOG_FIELDS).iterator(chunk_size=options['chunk_size'])
+
+        output = sys.stdout if options['output'] == '-' else open(options['output'], 'w', encoding='utf-8', newline='')
+        started = time.monotonic()
+        count = 0
+        try:
+            if fmt == 'csv':
+                writer = csv.DictWriter(output, fieldnames=CATALOG_FIELDS)
+                writer.writeheader()
+                for values in rows:
+                    writer.writerow(encode_row(values, fmt))
+                    count += 1
+            else:
+                for values in rows:
+                    output.write(json.dumps(encode_row(values, fmt), ensure_ascii=False))
+                    output.write('\n')
+                    count += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+        elapsed = time.monotonic() - started
+        self.stderr.write(f'{count} ejercicios exportados en {elapsed:.1f}s ({count / max(elapsed, 1e-6):.0f} filas/s)')
@@ -0,0 +1,171 @@
+import csv
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import as_serializer_error
+
+from exercises.angles import parse_ideal_angles
+from exercises.cache import bump_catalog_version
+from exercises.catalog_io import decode_row, detect_format
+from exercises.models import Exercise, ExerciseJointAngle
+from exercises.serializers import ExerciseCreateSerializer
+
+# Columnas que se actualizan cuando el id ya existe
+UPDATE_FIELDS = [
+    'name',
+    'muscle_group',
+    'secondary_muscles',
+    'difficulty',
+    'equipment',
+    'image',
+    'ideal_angles',
+    'common_mistakes',
+    'is_active',
+]
+
+# Fechas que se restauran del archivo después del upsert
+TIMESTAMP_FIELDS = ['created_at', 'updated_at']
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa ejercicios desde JSONL o CSV. Cada fila se valida con las reglas de '
+        'ExerciseCreateSerializer y se inserta o actualiza por id en lotes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help="Archivo de entrada o '-' para stdin")
+        parser.add_argument('--format', choices=['jsonl', 'csv'])
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--max-errors', type=int, default=100,
+                            help='Errores de validación que se muestran antes de resumirlos')
+
+    def handle(self, *args, **options):
+        fmt = detect_format(options['input'], options['format'])
+        self.batch_size = options['batch_size']
+        self.max_errors = options['max_errors']
+        self.imported = 0
+        self.errors = 0
+        self.started = time.monotonic()
+
+        # Una sola instancia del serializer: construir sus campos por fila cuesta más que validar
+        self.validator = ExerciseCreateSerializer()
+
+        source = sys.stdin if options['input'] == '-' else open(options['input'], encoding='utf-8', newline='')
+        try:
+            rows = csv.DictReader(source) if fmt == 'csv' else (json.loads(line) for line in source if line.strip())
+
+            batch = []
+            for number, raw in enumerate(rows, start=1):
+                exercise = self._build_exercise(number, raw, fmt)
+                if exercise is None:
+                    continue
+
+                batch.append((number, exercise))
+                if len(batch) >= self.batch_size:
+                    self._flush(batch)
+                    batch = []
+
+            if batch:
+                self._flush(batch)
+        except json.JSONDecodeError as error:
+            raise CommandError(f'JSON no válido: {error}')
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            # bulk_create no envía señales, así que la cache se invalida una sola vez al final,
+            # también si la importación se interrumpe después de confirmar algunos lotes.
+            # La versión vive en la cache compartida, así que también la ve el servidor.
+            bump_catalog_version()
+
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(
+            f'{self.imported} ejercicios importados, {self.errors} filas con errores, '
+            f'{elapsed:.1f}s ({self.imported / max(elapsed, 1e-6):.0f} filas/s)'
+        )
+
+    def _build_exercise(self, number, raw, fmt):
+        try:
+            row = decode_row(raw, fmt)
+        except (KeyError, ValueError) as error:
+            self._report(number, {'id': [f'Fila no válida: {error}']})
+            return None
+
+        data = {key: value for key, value in row.items() if key != 'image'}
+        try:
+            validated_data = self.validator.run_validation(data)
+        except ValidationError as error:
+            self._report(number, as_serializer_error(error))
+            return None
+
+        now = timezone.now()
+        return Exercise(
+            id=row['id'],
+            image=row.get('image'),
+            is_active=row['is_active'],
+            created_at=row['created_at'] or now,
+            updated_at=row['updated_at'] or now,
+            **validated_data
+        )
+
+    def _flush(self, batch):
+        # PostgreSQL no permite que un mismo INSERT ... ON CONFLICT toque dos veces el mismo id;
+        # si el id se repite en el lote gana la última fila
+        unique = {}
+        for number, exercise in batch:
+            unique.pop(exercise.id, None)
+            unique[exercise.id] = (number, exercise)
+        batch = list(unique.values())
+
+        exercises = [exercise for _, exercise in batch]
+        try:
+            with transaction.atomic():
+                self._upsert(exercises)
+            self.imported += len(exercises)
+        except IntegrityError:
+            # Algún nombre activo choca con otro; se reintenta fila por fila para reportar cuál
+            for number, exercise in batch:
+                try:
+                    with transaction.atomic():
+                        self._upsert([exercise])
+                    self.imported += 1
+                except IntegrityError:
+                    self._report(number, {'name': ["Lo siento, ya existe un ejercicio activo con este nombre."]})
+
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(f'... {self.imported} importados ({self.imported / max(elapsed, 1e-6):.0f} filas/s)')
+
+    def _upsert(self, exercises):
+        timestamps = [(exercise.created_at, exercise.updated_at) for exercise in exercises]
+        Exercise.objects.bulk_create(
+            exercises,
+            update_conflicts=True,
+            unique_fields=['id'],
+            update_fields=UPDATE_FIELDS
+        )
+
+        # bulk_create aplica auto_now/auto_now_add; las fechas del archivo se escriben después
+        for exercise, (created_at, updated_at) in zip(exercises, timestamps):
+            exercise.created_at, exercise.updated_at = created_at, updated_at
+        Exercise.objects.bulk_update(exercises, TIMESTAMP_FIELDS)
+
+        # Mantener sincronizado el índice de ángulos ideales
+        ids = [exercise.id for exercise in exercises]
+        ExerciseJointAngle.objects.filter(exercise_id__in=ids).delete()
+        ExerciseJointAngle.objects.bulk_create([
+            ExerciseJointAngle(exercise_id=exercise.id, joint=joint, target=target, tolerance=tolerance)
+            for exercise in exercises
+            for joint, (target, tolerance) in parse_ideal_angles(exercise.ideal_angles).items()
+        ])
+
+    def _report(self, number, errors):
+        self.errors += 1
+        if self.errors <= self.max_errors:
+            self.stderr.write(f'Fila {number}: {json.dumps(errors, ensure_ascii=False, default=str)}')
+        elif self.errors == self.max_errors + 1:
+            self.stderr.write('Demasiados errores, ya no se mostrarán más.')
@@ -0,0 +1,147 @@
+import json
+import os
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from exercises.angles import parse_ideal_angles
+from exercises.models import Exercise
+from exercises.scoring import DEFAULT_TOLERANCE, score_file
+
+
+class Command(BaseCommand):
+    help = (
+        'Puntúa sesiones archivadas (keypoints .npy en <directorio>/<id de ejercicio>/*.npy) '
+        'contra los ángulos ideales actuales usando todos los núcleos. '
+        'Los resultados se escriben en JSONL a medida que terminan y el comando puede reanudarse; '
+        'al reanudar se reintentan las sesiones que fallaron (la última línea de cada sesión es la vigente).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--output', required=True, help='Archivo JSONL de resultados')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--fps', type=float, default=30.0, help='Frames por segundo de las grabaciones')
+        parser.add_argument('--default-tolerance', type=float, default=DEFAULT_TOLERANCE,
+                            help='Tolerancia en grados para los ángulos ideales que no indican una')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignora los resultados existentes y vuelve a puntuar todo')
+
+    def handle(self, *args, **options):
+        directory = Path(options['directory'])
+        if not directory.is_dir():
+            raise CommandError(f'No existe el directorio {directory}')
+        if options['default_tolerance'] < 0:
+            raise CommandError('--default-tolerance no puede ser negativa')
+
+        output = Path(options['output'])
+        done = set() if options['restart'] else self._completed(output)
+        tasks, skipped = self._collect(directory, done)
+
+        self.stdout.write(
+            f'{len(tasks)} sesiones por puntuar, {len(done)} ya puntuadas, {skipped} sin ejercicio válido'
+        )
+        if not tasks:
+            return
+
+        # Los procesos de trabajo no usan la base de datos; no deben heredar la conexión abierta
+        connections.close_all()
+
+        started = time.monotonic()
+        scored = 0
+        mode = 'w' if options['restart'] else 'a'
+        max_in_flight = options['workers'] * 2
+
+        with open(output, mode, encoding='utf-8') as results, \
+                ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            pending = {}
+            tasks = iter(tasks)
+
+            while True:
+                # Se mantiene un número acotado de tareas en cola para no crecer en memoria
+                for key, exercise_id, path, targets in tasks:
+                    future = pool.submit(
+                        score_file, str(path), targets, options['fps'], options['default_tolerance']
+                    )
+                    pending[future] = (key, exercise_id)
+                    if len(pending) >= max_in_flight:
+                        break
+
+                if not pending:
+                    break
+
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    key, exercise_id = pending.pop(future)
+                    try:
+                        result = {'session': key, 'exercise_id': exercise_id, **future.result()}
+                    except Exception as error:
+                        result = {'session': key, 'exercise_id': exercise_id, 'error': str(error)}
+
+                    # Cada resultado se escribe y se vacía de inmediato para poder reanudar
+                    results.write(json.dumps(result, ensure_ascii=False) + '\n')
+                    results.flush()
+                    scored += 1
+
+                    if scored % 100 == 0:
+                        elapsed = time.monotonic() - started
+                        self.stdout.write(f'... {scored} sesiones ({scored / elapsed:.0f}/s)')
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(f'{scored} sesiones puntuadas en {elapsed:.1f}s')
+
+    def _completed(self, output):
+        # Sesiones que ya tienen resultado; las que terminaron con error no cuentan para
+        # poder reintentarlas. Si una interrupción dejó la última línea cortada, se elimina
+        # para que los nuevos resultados empiecen en una línea limpia.
+        done = set()
+        if not output.exists():
+            return done
+
+        with open(output, 'rb+') as results:
+            content = results.read()
+            complete = content.rfind(b'\n') + 1
+            if complete < len(content):
+                results.truncate(complete)
+
+        for line in content[:complete].decode('utf-8').splitlines():
+            try:
+                result = json.loads(line)
+                session = result['session']
+            except (ValueError, KeyError, TypeError):
+                continue
+
+            if 'error' in result:
+                done.discard(session)
+            else:
+                done.add(session)
+        return done
+
+    def _collect(self, directory, done):
+        targets_by_exercise = {}
+        for exercise_id, ideal_angles in Exercise.objects.filter(is_active=True).values_list('id', 'ideal_angles'):
+            targets_by_exercise[str(exercise_id)] = parse_ideal_angles(ideal_angles)
+
+        tasks = []
+        skipped = 0
+        for path in sorted(directory.glob('*/*.npy')):
+            key = path.relative_to(directory).as_posix()
+            if key in done:
+                continue
+
+            try:
+                exercise_id = str(uuid.UUID(path.parent.name))
+            except ValueError:
+                exercise_id = None
+
+            targets = targets_by_exercise.get(exercise_id)
+            if not targets:
+                skipped += 1
+                continue
+            tasks.append((key, exercise_id, path, targets))
+
+        return tasks, skipped
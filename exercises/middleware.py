@@ -0,0 +1,269 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+
+from .permissions import get_token_payload
+
+PRIORITY_READ = 'read'
+PRIORITY_WRITE = 'write'
+
+DEFAULT_ADMISSION_CONTROL = {
+    # Solo se controlan las rutas que empiezan con este prefijo
+    'PATH_PREFIX': '/exercises/',
+    # Peticiones simultáneas por proceso y cuántas de ellas se reservan para lecturas
+    'MAX_CONCURRENT': 8,
+    'RESERVED_FOR_READS': 2,
+    # Peticiones simultáneas permitidas por token
+    'MAX_CONCURRENT_PER_TOKEN': 4,
+    # Cubeta de tokens: recarga por segundo y capacidad máxima
+    'RATE': 10,
+    'BURST': 30,
+    # Costo en tokens de cada clase de prioridad
+    'COST': {PRIORITY_READ: 1, PRIORITY_WRITE: 5},
+    # Tiempo máximo (segundos) que una petición puede esperar turno antes de rechazarse
+    'QUEUE_BUDGET': {PRIORITY_READ: 1.0, PRIORITY_WRITE: 0.25},
+    # Rutas costosas que se tratan como escritura aunque sean GET
+    'EXPENSIVE_PATHS': [],
+    # 'local' (en memoria del proceso) o 'cache' (compartido vía CACHES)
+    'BACKEND': 'local',
+    'CACHE_ALIAS': 'default',
+}
+
+
+class LocalRateLimiter:
+    """
+    Cubeta de tokens en memoria del proceso, una por cliente.
+    Las cubetas que ya se llenaron de nuevo equivalen a no tener cubeta, así que se
+    eliminan periódicamente para que la memoria no crezca con cada cliente nuevo.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+        # Tiempo en que una cubeta vacía se vuelve a llenar
+        self.sweep_interval = burst / rate
+        self.next_sweep = time.monotonic() + self.sweep_interval
+
+    def consume(self, key, cost):
+        # Devuelve 0 si se admite la petición o los segundos que faltan para poder admitirla
+        now = time.monotonic()
+        with self.lock:
+            if now >= self.next_sweep:
+                self._sweep(now)
+
+            tokens, updated = self.buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+
+            if tokens < cost:
+                self.buckets[key] = (tokens, now)
+                return (cost - tokens) / self.rate
+
+            self.buckets[key] = (tokens - cost, now)
+            return 0
+
+    def refund(self, key, cost):
+        # Devuelve los tokens de una petición que al final no se atendió
+        with self.lock:
+            if key in self.buckets:
+                tokens, updated = self.buckets[key]
+                self.buckets[key] = (min(self.burst, tokens + cost), updated)
+
+    def _sweep(self, now):
+        self.buckets = {
+            key: (tokens, updated)
+            for key, (tokens, updated) in self.buckets.items()
+            if tokens + (now - updated) * self.rate < self.burst
+        }
+        self.next_sweep = now + self.sweep_interval
+
+
+class CacheRateLimiter:
+    """
+    Límite compartido entre procesos usando el framework de cache de Django.
+    Aproxima la cubeta de tokens con una ventana fija de BURST / RATE segundos,
+    porque cache.incr es atómico en los backends compartidos (Redis, Memcached).
+    """
+
+    def __init__(self, rate, burst, alias='default'):
+        self.burst = burst
+        self.window = max(1, math.ceil(burst / rate))
+        self.cache = caches[alias]
+
+    def _window(self, key):
+        now = time.time()
+        window_start = int(now // self.window) * self.window
+        return now, window_start, f'admission:{key}:{window_start}'
+
+    def consume(self, key, cost):
+        now, window_start, cache_key = self._window(key)
+
+        self.cache.add(cache_key, 0, timeout=self.window * 2)
+        try:
+            used = self.cache.incr(cache_key, cost)
+        except ValueError:
+            # La llave expiró entre add e incr
+            self.cache.set(cache_key, cost, timeout=self.window * 2)
+            used = cost
+
+        if used > self.burst:
+            return window_start + self.window - now
+        return 0
+
+    def refund(self, key, cost):
+        # Si la ventana ya cambió no hay nada que devolver
+        _, _, cache_key = self._window(key)
+        try:
+            if self.cache.get(cache_key, 0) >= cost:
+                self.cache.decr(cache_key, cost)
+        except ValueError:
+            pass
+
+
+class ConcurrencyLimiter:
+    """
+    Limita las peticiones simultáneas del proceso y por token.
+    Las escrituras solo pueden ocupar MAX_CONCURRENT - RESERVED_FOR_READS plazas,
+    así las lecturas baratas siempre tienen lugar aunque haya escrituras en cola.
+    Solo tiene efecto con workers de varios hilos (gunicorn gthread, ver Dockerfile);
+    con workers síncronos cada proceso atiende una petición a la vez.
+    """
+
+    def __init__(self, max_concurrent, reserved_for_reads, max_per_key):
+        self.max_concurrent = max_concurrent
+        self.reserved_for_reads = reserved_for_reads
+        self.max_per_key = max_per_key
+        self.in_flight = 0
+        self.per_key = {}
+        self.condition = threading.Condition()
+
+    def acquire(self, key, priority, timeout):
+        # Devuelve (admitida, motivo); motivo es 'token' o 'overload' cuando se rechaza
+        capacity = self.max_concurrent
+        if priority != PRIORITY_READ:
+            capacity = max(1, self.max_concurrent - self.reserved_for_reads)
+
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            if self.per_key.get(key, 0) >= self.max_per_key:
+                return False, 'token'
+
+            while self.in_flight >= capacity:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False, 'overload'
+                self.condition.wait(remaining)
+
+            self.in_flight += 1
+            self.per_key[key] = self.per_key.get(key, 0) + 1
+            return True, None
+
+    def release(self, key):
+        with self.condition:
+            self.in_flight -= 1
+            remaining = self.per_key.get(key, 1) - 1
+            if remaining:
+                self.per_key[key] = remaining
+            else:
+                self.per_key.pop(key, None)
+            self.condition.notify_all()
+
+
+def _queued_seconds(request):
+    # Tiempo que la petición ya esperó antes de llegar al worker, según X-Request-Start
+    # (formato "t=<segundos>" de nginx o milisegundos/microsegundos desde epoch)
+    header = request.META.get('HTTP_X_REQUEST_START', '')
+    if not header:
+        return 0
+
+    try:
+        started = float(header.replace('t=', '').strip())
+    except ValueError:
+        return 0
+
+    if started > 1e14:
+        started /= 1e6
+    elif started > 1e11:
+        started /= 1e3
+    return max(0, time.time() - started)
+
+
+def _reject(status, message, retry_after):
+    response = JsonResponse({"error": message}, status=status)
+    response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+class AdmissionControlMiddleware:
+    """
+    Control de admisión y descarte de carga para las rutas de ejercicios.
+
+    - Limita la tasa por cliente (sub del JWT o IP) con una cubeta de tokens.
+    - Limita las peticiones simultáneas por cliente y por proceso, dando prioridad a lecturas.
+    - Responde 429/503 con Retry-After en lugar de dejar que la cola crezca.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = {**DEFAULT_ADMISSION_CONTROL, **getattr(settings, 'ADMISSION_CONTROL', {})}
+
+        if self.config['BACKEND'] == 'cache':
+            self.rate_limiter = CacheRateLimiter(
+                self.config['RATE'], self.config['BURST'], self.config['CACHE_ALIAS']
+            )
+        else:
+            self.rate_limiter = LocalRateLimiter(self.config['RATE'], self.config['BURST'])
+
+        self.concurrency = ConcurrencyLimiter(
+            self.config['MAX_CONCURRENT'],
+            self.config['RESERVED_FOR_READS'],
+            self.config['MAX_CONCURRENT_PER_TOKEN'],
+        )
+
+    def __call__(self, request):
+        if not request.path.startswith(self.config['PATH_PREFIX']):
+            return self.get_response(request)
+
+        priority = self._get_priority(request)
+        budget = self.config['QUEUE_BUDGET'][priority]
+
+        # Si la petición ya esperó demasiado en la cola del servidor, descartarla rápido
+        if _queued_seconds(request) > budget:
+            return _reject(503, "El servicio está saturado, intenta de nuevo más tarde.", budget)
+
+        key = self._get_client_key(request)
+        cost = self.config['COST'][priority]
+        wait = self.rate_limiter.consume(key, cost)
+        if wait > 0:
+            return _reject(429, "Demasiadas peticiones, intenta de nuevo más tarde.", wait)
+
+        admitted, reason = self.concurrency.acquire(key, priority, budget)
+        if not admitted:
+            # La petición no se atendió, así que no cuenta contra la tasa del cliente
+            self.rate_limiter.refund(key, cost)
+            if reason == 'token':
+                return _reject(429, "Demasiadas peticiones simultáneas con este token.", budget)
+            return _reject(503, "El servicio está saturado, intenta de nuevo más tarde.", budget)
+
+        try:
+            return self.get_response(request)
+        finally:
+            self.concurrency.release(key)
+
+    def _get_priority(self, request):
+        if any(request.path.startswith(p) for p in self.config['EXPENSIVE_PATHS']):
+            return PRIORITY_WRITE
+        if request.method in ('GET', 'HEAD', 'OPTIONS'):
+            return PRIORITY_READ
+        return PRIORITY_WRITE
+
+    def _get_client_key(self, request):
+        payload = get_token_payload(request)
+        if payload and payload.get('sub') is not None:
+            return f"sub:{payload['sub']}"
+        return f"ip:{request.META.get('REMOTE_ADDR', '')}"
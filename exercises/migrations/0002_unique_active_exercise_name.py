@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:22
+
+import sys
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+
+def deactivate_duplicate_names(apps, schema_editor):
+    # El índice no se puede crear si ya hay nombres activos repetidos: se conserva
+    # el ejercicio más reciente de cada nombre y los demás se desactivan
+    Exercise = apps.get_model('exercises', 'Exercise')
+    active = Exercise.objects.filter(is_active=True).annotate(lower_name=Lower('name'))
+
+    duplicated = list(
+        active.values('lower_name')
+        .annotate(total=models.Count('id'))
+        .filter(total__gt=1)
+        .values_list('lower_name', flat=True)
+    )
+    for lower_name in duplicated:
+        exercises = list(active.filter(lower_name=lower_name).order_by('-created_at', '-updated_at'))
+        kept, stale = exercises[0], exercises[1:]
+        Exercise.objects.filter(id__in=[e.id for e in stale]).update(is_active=False, updated_at=timezone.now())
+        sys.stdout.write(
+            f"\n  Nombre activo repetido '{kept.name}': se conserva {kept.id} y se desactivan "
+            f"{', '.join(str(e.id) for e in stale)}"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exercises', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(deactivate_duplicate_names, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='exercise',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), condition=models.Q(('is_active', True)), name='unique_active_exercise_name'),
+        ),
+    ]
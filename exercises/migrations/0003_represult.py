@@ -0,0 +1,71 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+PARTITIONED_TABLE_SQL = [
+    """
+    CREATE TABLE exercises_represult (
+        id bigint GENERATED BY DEFAULT AS IDENTITY,
+        user_sub varchar(255) NOT NULL,
+        rep_number integer NOT NULL CHECK (rep_number >= 0),
+        joint_deviations jsonb NOT NULL,
+        mistakes jsonb NOT NULL,
+        recorded_at timestamp with time zone NOT NULL,
+        exercise_id uuid NOT NULL
+            REFERENCES exercises_exercise (id) DEFERRABLE INITIALLY DEFERRED,
+        PRIMARY KEY (id, recorded_at)
+    ) PARTITION BY RANGE (recorded_at)
+    """,
+    'CREATE INDEX represult_exercise_time ON exercises_represult (exercise_id, recorded_at)',
+    'CREATE INDEX represult_user_time ON exercises_represult (user_sub, recorded_at)',
+    # Recibe las filas que no caen en ninguna partición mensual creada
+    'CREATE TABLE exercises_represult_default PARTITION OF exercises_represult DEFAULT',
+]
+
+
+def create_represult_table(apps, schema_editor):
+    # En PostgreSQL la tabla se particiona por mes; en otros motores se crea normal
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in PARTITIONED_TABLE_SQL:
+            schema_editor.execute(sql)
+    else:
+        schema_editor.create_model(apps.get_model('exercises', 'RepResult'))
+
+
+def drop_represult_table(apps, schema_editor):
+    schema_editor.delete_model(apps.get_model('exercises', 'RepResult'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exercises', '0002_unique_active_exercise_name'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='RepResult',
+                    fields=[
+                        ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                        ('user_sub', models.CharField(max_length=255)),
+                        ('rep_number', models.PositiveIntegerField()),
+                        ('joint_deviations', models.JSONField(default=dict)),
+                        ('mistakes', models.JSONField(default=list)),
+                        ('recorded_at', models.DateTimeField()),
+                        ('exercise', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='rep_results', to='exercises.exercise')),
+                    ],
+                    options={
+                        'verbose_name': 'Resultado de repetición',
+                        'verbose_name_plural': 'Resultados de repeticiones',
+                        'ordering': ['-recorded_at'],
+                        'indexes': [models.Index(fields=['exercise', 'recorded_at'], name='represult_exercise_time'), models.Index(fields=['user_sub', 'recorded_at'], name='represult_user_time')],
+                    },
+                ),
+            ],
+        ),
+        migrations.RunPython(create_represult_table, drop_represult_table),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exercises', '0003_represult'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExerciseDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('kind', models.CharField(choices=[('reps', 'Repeticiones'), ('joint', 'Articulación'), ('mistake', 'Error común')], max_length=10)),
+                ('label', models.CharField(blank=True, default='', max_length=255)),
+                ('count', models.PositiveBigIntegerField(default=0)),
+                ('total', models.FloatField(default=0)),
+                ('exercise', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='exercises.exercise')),
+            ],
+            options={
+                'verbose_name': 'Agregado diario',
+                'verbose_name_plural': 'Agregados diarios',
+                'indexes': [models.Index(fields=['day', 'exercise'], name='rollup_day_exercise')],
+                'constraints': [models.UniqueConstraint(fields=('exercise', 'day', 'kind', 'label'), name='unique_exercise_daily_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:25
+
+import json
+from numbers import Number
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Copia de exercises.angles.parse_ideal_angles al momento de esta migración, para que
+# los cambios posteriores a ese módulo no alteren el backfill
+def _to_float(value):
+    if isinstance(value, bool) or not isinstance(value, Number):
+        return None
+    return float(value)
+
+
+def _parse_angle(value):
+    number = _to_float(value)
+    if number is not None:
+        return number, 0.0
+
+    if not isinstance(value, dict):
+        return None
+
+    for key in ('target', 'ideal', 'angle', 'objetivo', 'angulo'):
+        target = _to_float(value.get(key))
+        if target is not None:
+            tolerance = _to_float(value.get('tolerance', value.get('tolerancia'))) or 0.0
+            return target, abs(tolerance)
+
+    low = _to_float(value.get('min'))
+    high = _to_float(value.get('max'))
+    if low is not None and high is not None:
+        return (low + high) / 2, abs(high - low) / 2
+
+    return None
+
+
+def parse_ideal_angles(ideal_angles):
+    if isinstance(ideal_angles, str):
+        try:
+            ideal_angles = json.loads(ideal_angles)
+        except ValueError:
+            return {}
+
+    if isinstance(ideal_angles, list):
+        items = [
+            (item.get('joint'), item)
+            for item in ideal_angles
+            if isinstance(item, dict)
+        ]
+    elif isinstance(ideal_angles, dict):
+        items = ideal_angles.items()
+    else:
+        return {}
+
+    angles = {}
+    for joint, value in items:
+        if not isinstance(joint, str) or not joint.strip():
+            continue
+
+        parsed = _parse_angle(value)
+        if parsed is not None:
+            angles[joint.strip().lower()[:50]] = parsed
+    return angles
+
+
+def backfill_joint_angles(apps, schema_editor):
+    Exercise = apps.get_model('exercises', 'Exercise')
+    ExerciseJointAngle = apps.get_model('exercises', 'ExerciseJointAngle')
+
+    rows = [
+        ExerciseJointAngle(exercise_id=exercise_id, joint=joint, target=target, tolerance=tolerance)
+        for exercise_id, ideal_angles in Exercise.objects.values_list('id', 'ideal_angles').iterator()
+        for joint, (target, tolerance) in parse_ideal_angles(ideal_angles).items()
+    ]
+    ExerciseJointAngle.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exercises', '0004_exercisedailyrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExerciseJointAngle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('joint', models.CharField(max_length=50)),
+                ('target', models.FloatField()),
+                ('tolerance', models.FloatField(default=0)),
+                ('exercise', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='joint_angles', to='exercises.exercise')),
+            ],
+            options={
+                'verbose_name': 'Ángulo ideal',
+                'verbose_name_plural': 'Ángulos ideales',
+                'indexes': [models.Index(fields=['joint', 'target'], name='jointangle_joint_target')],
+                'constraints': [models.UniqueConstraint(fields=('exercise', 'joint'), name='unique_exercise_joint_angle')],
+            },
+        ),
+        migrations.RunPython(backfill_joint_angles, migrations.RunPython.noop),
+    ]
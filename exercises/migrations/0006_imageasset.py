@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exercises', '0005_exercisejointangle'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageAsset',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('stored', models.CharField(max_length=255)),
+                ('size', models.PositiveIntegerField()),
+                ('width', models.PositiveIntegerField(blank=True, null=True)),
+                ('height', models.PositiveIntegerField(blank=True, null=True)),
+                ('thumbnails', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Imagen',
+                'verbose_name_plural': 'Imágenes',
+            },
+        ),
+    ]
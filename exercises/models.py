@@ -2,6 +2,7 @@ import uuid
 
 from cloudinary.models import CloudinaryField
 from django.db import models
+from django.db.models.functions import Lower
 
 class Exercise(models.Model):
     MUSCLE_GROUP = [
@@ -52,4 +53,122 @@ class Exercise(models.Model):
     class Meta:
         ordering = ['-created_at']  # Los mas recientes primero
         verbose_name = 'Ejercicio'
-        verbose_name_plural = 'Ejercicios'
\ No newline at end of file
+        verbose_name_plural = 'Ejercicios'
+        constraints = [
+            # Solo puede haber un ejercicio activo con el mismo nombre (sin importar mayúsculas)
+            models.UniqueConstraint(
+                Lower('name'),
+                condition=models.Q(is_active=True),
+                name='unique_active_exercise_name'
+            )
+        ]
+
+class RepResult(models.Model):
+    """
+    Resultado de una repetición registrada durante un entrenamiento.
+    En PostgreSQL la tabla está particionada por mes sobre recorded_at
+    (ver migración 0003 y el comando create_telemetry_partitions).
+    """
+    id = models.BigAutoField(primary_key=True)
+
+    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE, related_name='rep_results', db_index=False)
+    user_sub = models.CharField(max_length=255)
+    rep_number = models.PositiveIntegerField()
+    joint_deviations = models.JSONField(default=dict)
+    mistakes = models.JSONField(default=list)
+    recorded_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.exercise_id} - {self.user_sub} - {self.rep_number}"
+
+    class Meta:
+        ordering = ['-recorded_at']
+        verbose_name = 'Resultado de repetición'
+        verbose_name_plural = 'Resultados de repeticiones'
+        indexes = [
+            models.Index(fields=['exercise', 'recorded_at'], name='represult_exercise_time'),
+            models.Index(fields=['user_sub', 'recorded_at'], name='represult_user_time'),
+        ]
+
+
+class ExerciseDailyRollup(models.Model):
+    """
+    Agregados diarios por ejercicio que se actualizan incrementalmente al guardar
+    resultados de repeticiones (ver exercises/rollups.py).
+    - reps: count = repeticiones del día
+    - joint: count = muestras de la articulación, total = suma de la desviación absoluta
+    - mistake: count = veces que se cometió el error
+    """
+    KIND = [
+        ('reps', 'Repeticiones'),
+        ('joint', 'Articulación'),
+        ('mistake', 'Error común')
+    ]
+
+    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE, related_name='daily_rollups', db_index=False)
+    day = models.DateField()
+    kind = models.CharField(choices=KIND, max_length=10)
+    label = models.CharField(max_length=255, blank=True, default='')
+    count = models.PositiveBigIntegerField(default=0)
+    total = models.FloatField(default=0)
+
+    def __str__(self):
+        return f"{self.exercise_id} - {self.day} - {self.kind} - {self.label}"
+
+    class Meta:
+        verbose_name = 'Agregado diario'
+        verbose_name_plural = 'Agregados diarios'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['exercise', 'day', 'kind', 'label'],
+                name='unique_exercise_daily_rollup'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['day', 'exercise'], name='rollup_day_exercise'),
+        ]
+
+
+class ExerciseJointAngle(models.Model):
+    """
+    Ángulo ideal de una articulación, extraído de Exercise.ideal_angles para
+    poder filtrar por articulación y rango de ángulo con índices (ver exercises/angles.py).
+    """
+    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE, related_name='joint_angles', db_index=False)
+    joint = models.CharField(max_length=50)
+    target = models.FloatField()
+    tolerance = models.FloatField(default=0)
+
+    def __str__(self):
+        return f"{self.exercise_id} - {self.joint}: {self.target}±{self.tolerance}"
+
+    class Meta:
+        verbose_name = 'Ángulo ideal'
+        verbose_name_plural = 'Ángulos ideales'
+        constraints = [
+            models.UniqueConstraint(fields=['exercise', 'joint'], name='unique_exercise_joint_angle')
+        ]
+        indexes = [
+            models.Index(fields=['joint', 'target'], name='jointangle_joint_target'),
+        ]
+
+
+class ImageAsset(models.Model):
+    """
+    Imagen guardada una sola vez, identificada por el SHA-256 de su contenido.
+    Los ejercicios que suben la misma imagen reutilizan el archivo ya guardado.
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    stored = models.CharField(max_length=255)
+    size = models.PositiveIntegerField()
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    thumbnails = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sha256} - {self.stored}"
+
+    class Meta:
+        verbose_name = 'Imagen'
+        verbose_name_plural = 'Imágenes'
@@ -2,25 +2,41 @@ import jwt
 from django.conf import settings
 from rest_framework import permissions
 
+_UNSET = object()
+
+
+def get_token_payload(request):
+    """
+    Devuelve el payload del JWT de la petición o None si no hay token o no es válido.
+    El resultado se guarda en la petición para no decodificar el token dos veces
+    (el middleware de admisión y el permiso lo necesitan).
+    """
+    django_request = getattr(request, '_request', request)
+    payload = getattr(django_request, '_token_payload', _UNSET)
+    if payload is not _UNSET:
+        return payload
+
+    payload = None
+    auth_header = django_request.META.get('HTTP_AUTHORIZATION', '')
+    if auth_header.startswith('Bearer '):
+        try:
+            payload = jwt.decode(auth_header.split(' ')[1], settings.SECRET_KEY, algorithms=['HS256'])
+        except (jwt.ExpiredSignatureError, jwt.InvalidTokenError):
+            payload = None
+
+    django_request._token_payload = payload
+    return payload
+
+
 class IsAuthenticated(permissions.BasePermission):
     """
     Permite acceso a cualquier usuario autenticado (con token JWT válido) para cualquier metodo.
     """
 
     def has_permission(self, request, view):
-        token = self._get_token_from_request(request)
-        if not token:
-            return False
-
-        try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            user_is_active = payload.get('is_active', True)
-            return user_is_active
-        except (jwt.ExpiredSignatureError, jwt.InvalidTokenError):
+        payload = get_token_payload(request)
+        if payload is None:
             return False
 
-    def _get_token_from_request(self, request):
-        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-        if auth_header.startswith('Bearer '):
-            return auth_header.split(' ')[1]
-        return None
\ No newline at end of file
+        user_is_active = payload.get('is_active', True)
+        return user_is_active
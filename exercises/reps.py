@@ -0,0 +1,206 @@
+"""
+Detección de repeticiones, tempo y rango de movimiento sobre la serie de ángulos
+de la articulación principal de un ejercicio (la primera que devuelve parse_ideal_angles).
+
+RepCounter procesa un frame a la vez con estado constante (filtro exponencial más
+una máquina de estados de fases), así que sirve tanto para flujos en vivo como para
+recorrer sesiones completas con count_reps. No depende de Django.
+"""
+import math
+
+# Fases de una repetición
+TOP = 'top'  # en reposo, cerca del ángulo inicial
+ECCENTRIC = 'eccentric'  # alejándose del reposo hacia el ángulo ideal
+CONCENTRIC = 'concentric'  # regresando al reposo
+
+
+class RepCounter:
+    """
+    Cuenta repeticiones de una articulación.
+
+    - target/tolerance: ángulo ideal en el punto de máxima flexión o extensión.
+    - hysteresis: grados que el ángulo debe moverse para cambiar de fase; evita contar ruido.
+    - alpha: peso del filtro exponencial (1 = sin suavizado).
+
+    El lado del reposo no se toma del primer frame, que puede caer a mitad de una repetición
+    o incluso más allá del ángulo ideal: se decide en la primera vuelta del movimiento, y es
+    el extremo más lejano del ángulo ideal.
+
+    update() devuelve un dict con los datos de la repetición cuando termina una, o None.
+    """
+
+    __slots__ = (
+        'target', 'tolerance', 'hysteresis', 'alpha',
+        'smoothed', 'phase', 'top', 'extreme', 'direction',
+        'start_time', 'turn_time', 'count',
+    )
+
+    def __init__(self, target, tolerance=0.0, hysteresis=15.0, alpha=0.5):
+        self.target = float(target)
+        self.tolerance = float(tolerance)
+        self.hysteresis = float(hysteresis)
+        self.alpha = float(alpha)
+        self.reset()
+
+    @classmethod
+    def from_targets(cls, targets, **kwargs):
+        # targets es el resultado de parse_ideal_angles, que pone primero la articulación principal
+        if not targets:
+            raise ValueError("El ejercicio no tiene ángulos ideales")
+
+        joint, (target, tolerance) = next(iter(targets.items()))
+        return joint, cls(target, tolerance, **kwargs)
+
+    def reset(self):
+        self.smoothed = None
+        self.phase = TOP
+        self.top = None
+        self.extreme = None
+        self.direction = 0
+        self.start_time = None
+        self.turn_time = None
+        self.count = 0
+
+    def update(self, angle, timestamp):
+        if angle != angle:  # NaN: keypoints no detectados en este frame
+            return None
+
+        smoothed = self.smoothed
+        if smoothed is None:
+            self.smoothed = self.top = self.extreme = angle
+            return None
+
+        smoothed += self.alpha * (angle - smoothed)
+        self.smoothed = smoothed
+        if not self.direction:
+            self._find_direction(smoothed, timestamp)
+            return None
+
+        # Distancia recorrida desde el reposo hacia el ángulo ideal
+        depth = (self.top - smoothed) * self.direction
+
+        if self.phase == TOP:
+            if depth < 0:
+                # Sigue en reposo pero más extendido: se ajusta la referencia
+                self.top = smoothed
+            elif depth >= self.hysteresis:
+                self.phase = ECCENTRIC
+                self.start_time = self.turn_time = timestamp
+                self.extreme = smoothed
+            return None
+
+        if self.phase == ECCENTRIC:
+            if (self.extreme - smoothed) * self.direction > 0:
+                self.extreme = smoothed
+                self.turn_time = timestamp
+            elif (smoothed - self.extreme) * self.direction >= self.hysteresis:
+                self.phase = CONCENTRIC
+            return None
+
+        # CONCENTRIC: la repetición termina al volver cerca del reposo
+        if depth > self.hysteresis:
+            if (self.extreme - smoothed) * self.direction > 0:
+                # Volvió a bajar sin llegar al reposo: sigue siendo la misma repetición
+                self.phase = ECCENTRIC
+                self.extreme = smoothed
+                self.turn_time = timestamp
+            return None
+
+        self.phase = TOP
+        self.count += 1
+        shortfall = max(0.0, (self.extreme - self.target) * self.direction - self.tolerance)
+        rep = {
+            'rep': self.count,
+            'start': self.start_time,
+            'bottom': self.turn_time,
+            'end': timestamp,
+            'eccentric_seconds': round(self.turn_time - self.start_time, 3),
+            'concentric_seconds': round(timestamp - self.turn_time, 3),
+            'duration_seconds': round(timestamp - self.start_time, 3),
+            'top_angle': round(self.top, 1),
+            'extreme_angle': round(self.extreme, 1),
+            'range_of_motion': round(abs(self.top - self.extreme), 1),
+            'reached_target': shortfall == 0.0,
+            'shortfall': round(shortfall, 1),
+        }
+        self.top = smoothed
+        return rep
+
+    def _find_direction(self, smoothed, timestamp):
+        # direction es +1 si el ángulo ideal está por debajo del reposo (flexión), -1 si está por encima
+        if self.start_time is None:
+            # Todavía no hay movimiento: top y extreme guardan el máximo y el mínimo observados
+            if smoothed > self.top:
+                self.top = smoothed
+            elif smoothed < self.extreme:
+                self.extreme = smoothed
+
+            if self.top - self.extreme >= self.hysteresis:
+                # Empezó el movimiento: top queda en el punto de partida y extreme en el actual
+                if smoothed == self.top:
+                    self.top, self.extreme = self.extreme, self.top
+                self.start_time = self.turn_time = timestamp
+            return
+
+        if abs(smoothed - self.top) > abs(self.extreme - self.top):
+            self.extreme = smoothed
+            self.turn_time = timestamp
+            return
+        if abs(smoothed - self.extreme) < self.hysteresis:
+            return
+
+        # Primera vuelta: el reposo es el extremo más lejano del ángulo ideal
+        if abs(self.top - self.target) >= abs(self.extreme - self.target):
+            # Se empezó en reposo, así que lo recorrido hasta ahora fue la fase excéntrica
+            self.direction = 1 if self.top > self.extreme else -1
+            self.phase = CONCENTRIC
+        else:
+            # Se empezó pasado el ángulo ideal: la repetición incompleta no se cuenta y
+            # el extremo recién alcanzado es el reposo desde el que empieza la siguiente
+            self.direction = 1 if self.extreme > self.top else -1
+            self.top = self.extreme
+            self.phase = ECCENTRIC
+            self.start_time = self.turn_time = timestamp
+            self.extreme = smoothed
+
+
+def count_reps(angles, fps=30.0, timestamps=None, counter=None, **kwargs):
+    """
+    Recorre una serie completa de ángulos y devuelve la lista de repeticiones.
+    Usa timestamps (segundos) si se dan; si no, los calcula con fps.
+    """
+    if counter is None:
+        counter = RepCounter(**kwargs)
+
+    # Iterar floats de Python es más rápido que escalares de numpy y se serializan a JSON
+    if hasattr(angles, 'tolist'):
+        angles = angles.tolist()
+
+    update = counter.update
+    reps = []
+    if timestamps is None:
+        timestamps = (i / fps for i in range(len(angles)))
+
+    for angle, timestamp in zip(angles, timestamps):
+        rep = update(angle, timestamp)
+        if rep is not None:
+            reps.append(rep)
+    return reps
+
+
+def summarize_reps(reps):
+    # Resumen de tempo y rango de movimiento para una sesión
+    if not reps:
+        return {'count': 0}
+
+    def mean(key):
+        return round(math.fsum(r[key] for r in reps) / len(reps), 3)
+
+    return {
+        'count': len(reps),
+        'avg_duration_seconds': mean('duration_seconds'),
+        'avg_eccentric_seconds': mean('eccentric_seconds'),
+        'avg_concentric_seconds': mean('concentric_seconds'),
+        'avg_range_of_motion': mean('range_of_motion'),
+        'reps_short_of_target': sum(1 for r in reps if not r['reached_target']),
+    }
@@ -0,0 +1,71 @@
+from collections import defaultdict
+from datetime import timezone
+
+from django.db import connection
+
+from .models import Exercise, ExerciseDailyRollup
+
+
+def _rollup_deltas(results):
+    # Agrupa los resultados en incrementos por (ejercicio, día, tipo, etiqueta)
+    deltas = defaultdict(lambda: [0, 0.0])
+
+    for result in results:
+        day = result.recorded_at.astimezone(timezone.utc).date()
+        base = (result.exercise_id, day)
+
+        deltas[base + ('reps', '')][0] += 1
+
+        for joint, deviation in (result.joint_deviations or {}).items():
+            delta = deltas[base + ('joint', joint[:255])]
+            delta[0] += 1
+            # Se usa el valor absoluto para que desviaciones opuestas no se cancelen
+            delta[1] += abs(deviation)
+
+        for mistake in result.mistakes or []:
+            deltas[base + ('mistake', mistake[:255])][0] += 1
+
+    return deltas
+
+
+def update_rollups(results):
+    """
+    Suma los resultados recién guardados a los agregados diarios con un solo
+    INSERT ... ON CONFLICT DO UPDATE. Debe llamarse en la misma transacción que
+    guarda los resultados para que ambos queden consistentes.
+    """
+    deltas = _rollup_deltas(results)
+    if not deltas:
+        return 0
+
+    table = connection.ops.quote_name(ExerciseDailyRollup._meta.db_table)
+    exercise_pk = Exercise._meta.pk
+    day_field = ExerciseDailyRollup._meta.get_field('day')
+
+    # Orden fijo de las llaves: dos workers que actualizan filas en común las bloquean
+    # en el mismo orden y no pueden quedar en deadlock
+    ordered = sorted(deltas.items(), key=lambda item: (str(item[0][0]),) + item[0][1:])
+
+    rows = []
+    params = []
+    for (exercise_id, day, kind, label), (count, total) in ordered:
+        rows.append('(%s, %s, %s, %s, %s, %s)')
+        params.extend([
+            exercise_pk.get_db_prep_value(exercise_id, connection),
+            day_field.get_db_prep_value(day, connection),
+            kind,
+            label,
+            count,
+            total,
+        ])
+
+    sql = (
+        f"INSERT INTO {table} (exercise_id, day, kind, label, count, total) "
+        f"VALUES {', '.join(rows)} "
+        f"ON CONFLICT (exercise_id, day, kind, label) DO UPDATE SET "
+        f"count = {table}.count + excluded.count, "
+        f"total = {table}.total + excluded.total"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+    return len(rows)
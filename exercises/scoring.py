@@ -0,0 +1,140 @@
+"""
+Cálculo de ángulos articulares y puntuación de sesiones a partir de keypoints.
+
+Los keypoints siguen el esquema de 33 puntos de MediaPipe Pose y se guardan como
+arreglos .npy de forma (frames, 33, 2+) con x, y en las dos primeras columnas.
+Este módulo no depende de Django para poder usarse en procesos de trabajo.
+Las repeticiones se cuentan con exercises/reps.py.
+"""
+import numpy as np
+
+from .reps import RepCounter, count_reps, summarize_reps
+
+# Índices de MediaPipe Pose
+LEFT_SHOULDER, RIGHT_SHOULDER = 11, 12
+LEFT_ELBOW, RIGHT_ELBOW = 13, 14
+LEFT_WRIST, RIGHT_WRIST = 15, 16
+LEFT_HIP, RIGHT_HIP = 23, 24
+LEFT_KNEE, RIGHT_KNEE = 25, 26
+LEFT_ANKLE, RIGHT_ANKLE = 27, 28
+LEFT_FOOT, RIGHT_FOOT = 31, 32
+
+# Tolerancia (grados) para ángulos guardados como un número sin tolerancia, p. ej. {"rodilla": 90}
+DEFAULT_TOLERANCE = 10.0
+
+# Cada articulación se mide como el ángulo en el vértice (punto del medio) de tres keypoints
+JOINT_KEYPOINTS = {
+    'codo': [(LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST), (RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST)],
+    'hombro': [(LEFT_HIP, LEFT_SHOULDER, LEFT_ELBOW), (RIGHT_HIP, RIGHT_SHOULDER, RIGHT_ELBOW)],
+    'cadera': [(LEFT_SHOULDER, LEFT_HIP, LEFT_KNEE), (RIGHT_SHOULDER, RIGHT_HIP, RIGHT_KNEE)],
+    'rodilla': [(LEFT_HIP, LEFT_KNEE, LEFT_ANKLE), (RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE)],
+    'tobillo': [(LEFT_KNEE, LEFT_ANKLE, LEFT_FOOT), (RIGHT_KNEE, RIGHT_ANKLE, RIGHT_FOOT)],
+}
+
+JOINT_ALIASES = {
+    'elbow': 'codo',
+    'shoulder': 'hombro',
+    'hip': 'cadera',
+    'knee': 'rodilla',
+    'ankle': 'tobillo',
+}
+
+SIDE_SUFFIXES = {
+    '_izquierda': 0, '_izquierdo': 0, '_izq': 0, '_left': 0,
+    '_derecha': 1, '_derecho': 1, '_der': 1, '_right': 1,
+}
+
+
+def resolve_joint(name):
+    """
+    Devuelve la lista de tripletas de keypoints de una articulación de ideal_angles,
+    p. ej. 'rodilla' (ambos lados) o 'codo_derecho'. None si no se reconoce.
+    """
+    name = name.strip().lower()
+    side = None
+    for suffix, index in SIDE_SUFFIXES.items():
+        if name.endswith(suffix):
+            name, side = name[:-len(suffix)], index
+            break
+
+    triplets = JOINT_KEYPOINTS.get(JOINT_ALIASES.get(name, name))
+    if triplets is None:
+        return None
+    return triplets if side is None else [triplets[side]]
+
+
+def joint_angles(keypoints, joint):
+    """
+    Serie de ángulos (grados, float32) de una articulación para todos los frames.
+    Si la articulación tiene dos lados se promedian. None si no se reconoce.
+    """
+    triplets = resolve_joint(joint)
+    if triplets is None:
+        return None
+
+    points = np.asarray(keypoints)[:, :, :2]
+    series = []
+    for a, b, c in triplets:
+        ba = points[:, a] - points[:, b]
+        bc = points[:, c] - points[:, b]
+        norms = np.linalg.norm(ba, axis=1) * np.linalg.norm(bc, axis=1)
+        cosine = np.einsum('ij,ij->i', ba, bc) / np.where(norms == 0, np.nan, norms)
+        series.append(np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0))))
+
+    if len(series) == 1:
+        return series[0].astype(np.float32)
+
+    # Promedio de ambos lados ignorando los frames donde un lado no se pudo medir
+    stacked = np.vstack(series)
+    counts = (~np.isnan(stacked)).sum(axis=0)
+    total = np.nansum(stacked, axis=0)
+    return (total / np.where(counts == 0, np.nan, counts)).astype(np.float32)
+
+
+def score_keypoints(keypoints, targets, fps=30.0, default_tolerance=DEFAULT_TOLERANCE):
+    """
+    Puntúa una sesión contra los ángulos ideales de un ejercicio.
+    targets es {articulación: (objetivo, tolerancia)} como lo devuelve parse_ideal_angles;
+    las articulaciones sin tolerancia (0) usan default_tolerance.
+    La puntuación es el porcentaje promedio de frames dentro de la tolerancia.
+    Las repeticiones se detectan sobre la articulación principal (la primera de targets,
+    ver parse_ideal_angles).
+    """
+    joints = {}
+    primary = {}
+    for joint, (target, tolerance) in targets.items():
+        angles = joint_angles(keypoints, joint)
+        if angles is None:
+            continue
+        tolerance = tolerance or default_tolerance
+
+        if not primary:
+            primary = {'joint': joint, 'angles': angles, 'target': target, 'tolerance': tolerance}
+
+        valid = angles[~np.isnan(angles)]
+        if not valid.size:
+            continue
+
+        deviation = np.abs(valid - target)
+        joints[joint] = {
+            'mean_angle': round(float(valid.mean()), 2),
+            'mean_deviation': round(float(deviation.mean()), 2),
+            'within_tolerance': round(float((deviation <= tolerance).mean()), 4),
+        }
+
+    score = None
+    if joints:
+        score = round(100 * sum(j['within_tolerance'] for j in joints.values()) / len(joints), 2)
+
+    reps = None
+    if primary:
+        counter = RepCounter(primary['target'], primary['tolerance'])
+        reps = {'joint': primary['joint'], **summarize_reps(count_reps(primary['angles'], fps=fps, counter=counter))}
+
+    return {'frames': int(len(keypoints)), 'score': score, 'joints': joints, 'reps': reps}
+
+
+def score_file(path, targets, fps=30.0, default_tolerance=DEFAULT_TOLERANCE):
+    # Pensada para procesos de trabajo: el arreglo se mapea desde el archivo en lugar de copiarse por pickle
+    keypoints = np.load(path, mmap_mode='r')
+    return score_keypoints(keypoints, targets, fps, default_tolerance)
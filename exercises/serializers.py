@@ -1,10 +1,53 @@
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 from rest_framework import serializers
+from .angles import sync_joint_angles
+from .images import store_image
 from .models import Exercise
 
 
-class ExerciseSerializer(serializers.ModelSerializer):
+def _is_active_name_conflict(error):
+    # La unicidad de nombres activos la garantiza el índice único parcial de la base de datos
+    return 'unique_active_exercise_name' in str(error)
+
+
+class SparseFieldsMixin:
+    """
+    Permite recortar la salida del serializer a los campos pedidos con ?fields=
+    y calcular las columnas del modelo que realmente hacen falta para ellos.
+    """
+    # Columnas del modelo de las que depende cada campo calculado
+    field_sources = {}
+    # Campos que solo se incluyen cuando se piden explícitamente con ?fields=
+    optional_fields = []
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+
+        excluded = set(self.fields) - set(fields) if fields else set(self.optional_fields)
+        for name in excluded:
+            self.fields.pop(name, None)
+
+    @classmethod
+    def model_columns(cls, fields):
+        columns = []
+        for name in fields:
+            for column in cls.field_sources.get(name, [name]):
+                if column not in columns:
+                    columns.append(column)
+        return columns
+
+
+class ExerciseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
 
+    field_sources = {
+        'image_url': ['image'],
+    }
+
     class Meta:
         model = Exercise
         fields = [
@@ -116,13 +159,6 @@ class ExerciseUpdateSerializer(serializers.ModelSerializer):
             if not value.strip():
                 raise serializers.ValidationError("El nombre del ejercicio no puede estar vacío.")
 
-            # Verificar que no exista otro ejercicio activo con el mismo nombre
-            if Exercise.objects.filter(
-                    name__iexact=value,
-                    is_active=True
-            ).exclude(id=self.instance.id).exists():
-                raise serializers.ValidationError("Ya existe otro ejercicio activo con este nombre.")
-
             return value.strip()
         return value
 
@@ -210,11 +246,25 @@ class ExerciseUpdateSerializer(serializers.ModelSerializer):
         return data
 
     def update(self, instance, validated_data):
-        # Actualizar solo los campos que se enviaron en PATCH
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-
-        instance.save()
+        # La imagen se sube antes de abrir la transacción; las repetidas reutilizan el archivo ya guardado
+        if validated_data.get('image'):
+            validated_data['image'] = store_image(validated_data['image'])
+
+        try:
+            with transaction.atomic():
+                # Actualizar solo los campos que se enviaron en PATCH
+                for attr, value in validated_data.items():
+                    setattr(instance, attr, value)
+
+                instance.save()
+                if 'ideal_angles' in validated_data:
+                    sync_joint_angles(instance)
+        except IntegrityError as error:
+            if _is_active_name_conflict(error):
+                raise serializers.ValidationError(
+                    {'name': ["Ya existe otro ejercicio activo con este nombre."]}
+                )
+            raise
         return instance
 
 
@@ -280,13 +330,6 @@ class ExerciseCreateSerializer(serializers.ModelSerializer):
     )
 
     def validate_name(self, value):
-        if self.instance:
-            if Exercise.objects.filter(name__iexact=value, is_active=True).exclude(id=self.instance.id).exists():
-                raise serializers.ValidationError("Lo siento, ya existe otro ejercicio activo con este nombre.")
-        else:
-            if Exercise.objects.filter(name__iexact=value, is_active=True).exists():
-                raise serializers.ValidationError("Lo siento, ya existe un ejercicio activo con este nombre.")
-
         return value.strip()
 
     def validate_image(self, value):
@@ -344,6 +387,23 @@ class ExerciseCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(errors)
         return data
 
+    def create(self, validated_data):
+        # La imagen se sube antes de abrir la transacción; las repetidas reutilizan el archivo ya guardado
+        if validated_data.get('image'):
+            validated_data['image'] = store_image(validated_data['image'])
+
+        try:
+            with transaction.atomic():
+                instance = super().create(validated_data)
+                sync_joint_angles(instance)
+                return instance
+        except IntegrityError as error:
+            if _is_active_name_conflict(error):
+                raise serializers.ValidationError(
+                    {'name': ["Lo siento, ya existe un ejercicio activo con este nombre."]}
+                )
+            raise
+
     class Meta:
         model = Exercise
         fields = [
@@ -358,13 +418,32 @@ class ExerciseCreateSerializer(serializers.ModelSerializer):
         ]
 
 
-class ExerciseListSerializer(serializers.ModelSerializer):
+class ExerciseListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     muscle_group_display = serializers.CharField(source='get_muscle_group_display', read_only=True)
     secondary_muscles = serializers.SerializerMethodField()
     difficulty_display = serializers.CharField(source='get_difficulty_display', read_only=True)
     equipment_display = serializers.CharField(source='get_equipment_display', read_only=True)
     image_url = serializers.SerializerMethodField()
 
+    field_sources = {
+        'muscle_group_display': ['muscle_group'],
+        'difficulty_display': ['difficulty'],
+        'equipment_display': ['equipment'],
+        'image_url': ['image'],
+    }
+
+    # El resto de los campos del detalle (p. ej. ideal_angles para la pantalla del coach)
+    optional_fields = [
+        'muscle_group',
+        'difficulty',
+        'equipment',
+        'ideal_angles',
+        'common_mistakes',
+        'is_active',
+        'created_at',
+        'updated_at',
+    ]
+
     class Meta:
         model = Exercise
         fields = [
@@ -375,6 +454,14 @@ class ExerciseListSerializer(serializers.ModelSerializer):
             'difficulty_display',
             'equipment_display',
             'image_url',
+            'muscle_group',
+            'difficulty',
+            'equipment',
+            'ideal_angles',
+            'common_mistakes',
+            'is_active',
+            'created_at',
+            'updated_at',
         ]
 
     def get_secondary_muscles(self, obj):
@@ -391,4 +478,34 @@ class ExerciseListSerializer(serializers.ModelSerializer):
     def get_image_url(self, obj):
         if obj.image:
             return obj.image.url
-        return None
\ No newline at end of file
+        return None
+
+
+# Ventana aceptada para recorded_at: los clientes sin conexión sincronizan después,
+# pero las fechas fuera de rango terminarían en la partición DEFAULT
+RECORDED_AT_MAX_AGE = timedelta(days=30)
+RECORDED_AT_MAX_SKEW = timedelta(minutes=5)
+
+
+class RepResultSerializer(serializers.Serializer):
+    exercise_id = serializers.UUIDField(
+        error_messages={
+            'required': 'El id del ejercicio es obligatorio.',
+            'invalid': 'El id del ejercicio no es válido.'
+        }
+    )
+    # La columna es integer en PostgreSQL
+    rep_number = serializers.IntegerField(min_value=0, max_value=2147483647)
+    joint_deviations = serializers.DictField(child=serializers.FloatField(), required=False, default=dict)
+    mistakes = serializers.ListField(child=serializers.CharField(max_length=255), required=False, default=list)
+    recorded_at = serializers.DateTimeField()
+
+    def validate_recorded_at(self, value):
+        now = timezone.now()
+        if value > now + RECORDED_AT_MAX_SKEW:
+            raise serializers.ValidationError("La fecha del resultado no puede estar en el futuro.")
+        if value < now - RECORDED_AT_MAX_AGE:
+            raise serializers.ValidationError(
+                f"Solo se aceptan resultados de los últimos {RECORDED_AT_MAX_AGE.days} días."
+            )
+        return value
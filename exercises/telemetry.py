@@ -0,0 +1,222 @@
+import atexit
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import date
+
+from django.conf import settings
+from django.db import DataError, IntegrityError, close_old_connections, connection, transaction
+
+from .models import RepResult
+from .rollups import update_rollups
+
+logger = logging.getLogger(__name__)
+# Filas que la base de datos rechazó; se registran completas para poder revisarlas o reenviarlas
+dead_letter_logger = logging.getLogger(f'{__name__}.dead_letter')
+
+DEFAULT_TELEMETRY_BUFFER = {
+    # Filas por INSERT y cantidad que dispara un vaciado inmediato
+    'BATCH_SIZE': 500,
+    # Segundos máximos que una fila puede esperar en memoria antes de escribirse
+    'FLUSH_INTERVAL': 2.0,
+    # Filas máximas en memoria; al llenarse las nuevas peticiones se rechazan
+    'MAX_BUFFER': 20000,
+}
+
+
+class BufferFull(Exception):
+    pass
+
+
+class TelemetryBuffer:
+    """
+    Acumula resultados de repeticiones en memoria y los escribe por lotes con bulk_create,
+    actualizando también los agregados diarios por ejercicio.
+
+    - Se vacía cuando hay BATCH_SIZE filas pendientes o pasan FLUSH_INTERVAL segundos.
+    - Si hay MAX_BUFFER filas pendientes, add() lanza BufferFull y la vista responde 503.
+    - Al terminar el proceso (apagado ordenado del worker) se escriben las filas pendientes.
+      Si el proceso muere de forma abrupta, las filas aún en memoria se pierden.
+    - Si un lote falla por un problema de la base de datos (conexión, bloqueo) se devuelve
+      a la cola mientras haya espacio.
+    - Si la base de datos rechaza los datos (DataError/IntegrityError) el lote se divide
+      hasta aislar las filas inválidas, que se descartan en el log dead_letter.
+    """
+
+    def __init__(self, batch_size, flush_interval, max_buffer):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.pending = deque()
+        self.condition = threading.Condition()
+        self.flush_lock = threading.Lock()
+        self.thread = None
+        self.closed = False
+        self.dropped = 0
+        self.rejected = 0
+
+    def add(self, records):
+        with self.condition:
+            if self.closed:
+                raise BufferFull()
+            if len(self.pending) + len(records) > self.max_buffer:
+                raise BufferFull()
+
+            self.pending.extend(records)
+            self._start_thread()
+            if len(self.pending) >= self.batch_size:
+                self.condition.notify()
+
+    def flush(self):
+        # Escribe todas las filas pendientes; devuelve cuántas se guardaron
+        written = 0
+        with self.flush_lock:
+            while True:
+                with self.condition:
+                    batch = [self.pending.popleft() for _ in range(min(self.batch_size, len(self.pending)))]
+                if not batch:
+                    return written
+
+                pieces = [batch]
+                while pieces:
+                    piece = pieces.pop()
+                    try:
+                        self._write(piece)
+                        written += len(piece)
+                    except (DataError, IntegrityError) as error:
+                        # Reintentarlo nunca funcionaría: se divide hasta aislar las filas inválidas
+                        if len(piece) == 1:
+                            self._dead_letter(piece[0], error)
+                        else:
+                            middle = len(piece) // 2
+                            pieces.extend([piece[middle:], piece[:middle]])
+                    except Exception:
+                        logger.exception("No se pudo guardar un lote de %s resultados", len(piece))
+                        self._requeue([record for p in [piece, *reversed(pieces)] for record in p])
+                        return written
+
+    def _write(self, batch):
+        # Los agregados se actualizan en la misma transacción que los resultados
+        with transaction.atomic():
+            RepResult.objects.bulk_create(batch, batch_size=self.batch_size)
+            update_rollups(batch)
+
+    def _dead_letter(self, record, error):
+        self.rejected += 1
+        dead_letter_logger.error(
+            "Resultado rechazado por la base de datos (%s): %s",
+            error,
+            json.dumps({
+                'exercise_id': record.exercise_id,
+                'user_sub': record.user_sub,
+                'rep_number': record.rep_number,
+                'joint_deviations': record.joint_deviations,
+                'mistakes': record.mistakes,
+                'recorded_at': record.recorded_at,
+            }, ensure_ascii=False, default=str)
+        )
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join(timeout=self.flush_interval * 2)
+        self.flush()
+
+    def _requeue(self, batch):
+        with self.condition:
+            space = max(0, self.max_buffer - len(self.pending))
+            self.dropped += len(batch) - min(space, len(batch))
+            self.pending.extendleft(reversed(batch[:space]))
+
+    def _start_thread(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name='telemetry-flusher', daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            with self.condition:
+                while not self.closed and len(self.pending) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                if self.closed:
+                    return
+
+            close_old_connections()
+            self.flush()
+            deadline = time.monotonic() + self.flush_interval
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    # Un buffer por proceso, creado la primera vez que se usa
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            config = {**DEFAULT_TELEMETRY_BUFFER, **getattr(settings, 'TELEMETRY_BUFFER', {})}
+            _buffer = TelemetryBuffer(config['BATCH_SIZE'], config['FLUSH_INTERVAL'], config['MAX_BUFFER'])
+            atexit.register(_buffer.close)
+        return _buffer
+
+
+def _add_months(day, months):
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def create_monthly_partitions(months_ahead=3, start=None):
+    """
+    Crea las particiones mensuales de exercises_represult desde el mes de start
+    hasta months_ahead meses después. Solo aplica en PostgreSQL.
+    Si la partición DEFAULT ya tiene filas de un mes nuevo, se mueven a su partición.
+    """
+    if connection.vendor != 'postgresql':
+        return []
+
+    first = _add_months(start or date.today(), 0)
+    created = []
+    with connection.cursor() as cursor:
+        for offset in range(months_ahead + 1):
+            lower = _add_months(first, offset)
+            upper = _add_months(first, offset + 1)
+            name = f"exercises_represult_{lower:%Y_%m}"
+            create = (
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF exercises_represult "
+                f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+            )
+            try:
+                with transaction.atomic():
+                    cursor.execute(create)
+            except IntegrityError:
+                # PostgreSQL no crea la partición si DEFAULT ya tiene filas en ese rango
+                with transaction.atomic():
+                    moved = _move_default_rows(cursor, create, lower, upper)
+                logger.warning("Se movieron %s resultados de la partición DEFAULT a %s", moved, name)
+            created.append(name)
+    return created
+
+
+def _move_default_rows(cursor, create, lower, upper):
+    # Saca las filas del rango, crea la partición y las vuelve a insertar a través de la tabla padre
+    cursor.execute("CREATE TEMP TABLE represult_moved (LIKE exercises_represult) ON COMMIT DROP")
+    cursor.execute(
+        "WITH moved AS ("
+        "    DELETE FROM exercises_represult_default"
+        "    WHERE recorded_at >= %s AND recorded_at < %s RETURNING *"
+        ") INSERT INTO represult_moved SELECT * FROM moved",
+        [lower, upper]
+    )
+    moved = cursor.rowcount
+    cursor.execute(create)
+    cursor.execute("INSERT INTO exercises_represult SELECT * FROM represult_moved")
+    return moved
@@ -1,3 +1,944 @@
-from django.test import TestCase
+import io
+import json
+import math
+import tempfile
+import threading
+import uuid
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import jwt
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.utils import timezone
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+
+from .angles import parse_ideal_angles, sync_joint_angles
+from .cache import _cache_key, bump_catalog_version, cached_response, get_catalog_version
+from .images import _thumbnail_job, generate_thumbnails
+from .management.commands.score_sessions import Command as ScoreSessionsCommand
+from .middleware import AdmissionControlMiddleware, LocalRateLimiter
+from .models import Exercise, ExerciseDailyRollup, ExerciseJointAngle, ImageAsset, RepResult
+from .reps import RepCounter, count_reps
+from .rollups import update_rollups
+from .scoring import LEFT_ANKLE, LEFT_HIP, LEFT_KNEE, joint_angles, score_keypoints
+from .serializers import ExerciseCreateSerializer, ExerciseUpdateSerializer, RepResultSerializer
+from .telemetry import BufferFull, TelemetryBuffer
+from .views import BATCH_MAX_IDS
+
+
+def exercise_data(name):
+    return {
+        'name': name,
+        'muscle_group': 'pierna',
+        'difficulty': 'principiante',
+        'equipment': 'cuerpo',
+        'ideal_angles': {'rodilla': 90},
+        'common_mistakes': ['Rodillas hacia adentro'],
+    }
+
+
+def api_client(sub='usuario'):
+    client = APIClient()
+    token = jwt.encode({'sub': sub}, settings.SECRET_KEY, algorithm='HS256')
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    return client
+
+
+class BatchLookupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = api_client()
+        self.squat = Exercise.objects.create(**exercise_data('Sentadilla'))
+        self.lunge = Exercise.objects.create(**exercise_data('Zancada'))
+        self.plank = Exercise.objects.create(is_active=False, **exercise_data('Plancha'))
+
+    def test_results_follow_request_order_and_report_missing_and_inactive(self):
+        unknown = uuid.uuid4()
+        ids = [self.lunge.id, self.plank.id, unknown, self.squat.id, self.lunge.id]
+
+        response = self.client.get('/exercises/batch/', {'ids': ','.join(str(i) for i in ids)})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([e['name'] for e in response.data['results']], ['Zancada', 'Sentadilla'])
+        self.assertEqual(response.data['missing'], [str(unknown)])
+        self.assertEqual(response.data['inactive'], [str(self.plank.id)])
+
+    def test_invalid_requests_are_rejected(self):
+        cases = [
+            {},
+            {'ids': 'no-es-uuid'},
+            {'ids': str(self.squat.id), 'shape': 'otro'},
+            {'ids': str(self.squat.id), 'fields': 'contraseña'},
+            {'ids': ','.join([str(self.squat.id)] * (BATCH_MAX_IDS + 1))},
+        ]
+        for query in cases:
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get('/exercises/batch/', query).status_code, 400)
+
+    def test_conditional_requests_return_not_modified(self):
+        query = {'ids': f'{self.squat.id},{self.lunge.id}'}
+        response = self.client.get('/exercises/batch/', query)
+
+        cached = self.client.get('/exercises/batch/', query, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+        self.lunge.name = 'Zancada lateral'
+        self.lunge.save()
+        changed = self.client.get('/exercises/batch/', query, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+
+    def test_detail_supports_conditional_requests(self):
+        url = f'/exercises/{self.squat.id}/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304
+        )
+
+
+class SparseFieldsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = api_client()
+        self.exercise = Exercise.objects.create(**exercise_data('Sentadilla'))
+
+    def select_sql(self, url, query):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, query)
+        self.assertEqual(response.status_code, 200)
+        select = [q['sql'] for q in queries.captured_queries if 'exercises_exercise' in q['sql']]
+        return response, select[-1]
+
+    def test_default_list_shape_is_unchanged(self):
+        response = self.client.get('/exercises/all/')
+
+        self.assertEqual(list(response.data[0]), [
+            'id', 'name', 'muscle_group_display', 'secondary_muscles',
+            'difficulty_display', 'equipment_display', 'image_url',
+        ])
+
+    def test_detail_fields_are_available_on_list_detail_and_filters(self):
+        requests = [
+            ('/exercises/all/', {}),
+            ('/exercises/muscle-group/', {'muscle_group': 'pierna'}),
+            (f'/exercises/{self.exercise.id}/', {}),
+        ]
+        for url, query in requests:
+            with self.subTest(url=url):
+                response, sql = self.select_sql(url, {**query, 'fields': 'id,ideal_angles,common_mistakes'})
+                data = response.data if isinstance(response.data, dict) else response.data[0]
+
+                self.assertEqual(set(data), {'id', 'ideal_angles', 'common_mistakes'})
+                self.assertEqual(data['ideal_angles'], {'rodilla': 90})
+                self.assertIn('"ideal_angles"', sql)
+                self.assertNotIn('"secondary_muscles"', sql)
+
+    def test_computed_fields_select_only_their_source_columns(self):
+        response, sql = self.select_sql('/exercises/all/', {'fields': 'name,difficulty_display'})
+
+        self.assertEqual(response.data, [{'name': 'Sentadilla', 'difficulty_display': 'Principiante'}])
+        self.assertIn('"difficulty"', sql)
+        self.assertNotIn('"ideal_angles"', sql)
+        self.assertNotIn('"common_mistakes"', sql)
+
+    def test_unknown_fields_are_rejected(self):
+        self.assertEqual(self.client.get('/exercises/all/', {'fields': 'name,contraseña'}).status_code, 400)
+
+
+class AdmissionControlTests(TestCase):
+    def middleware(self, **config):
+        with override_settings(ADMISSION_CONTROL={'RATE': 1, 'BURST': 3, **config}):
+            return AdmissionControlMiddleware(lambda request: HttpResponse('ok'))
+
+    def request(self, method='get', sub='usuario'):
+        token = jwt.encode({'sub': sub}, settings.SECRET_KEY, algorithm='HS256')
+        return getattr(RequestFactory(), method)('/exercises/all/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_rate_limit_returns_429_with_retry_after(self):
+        middleware = self.middleware()
+        codes = [middleware(self.request()).status_code for _ in range(3)]
+        response = middleware(self.request())
+
+        self.assertEqual(codes, [200, 200, 200])
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        # Cada cliente tiene su propia cubeta
+        self.assertEqual(middleware(self.request(sub='otro')).status_code, 200)
+
+    def test_writes_cost_more_than_reads(self):
+        middleware = self.middleware(COST={'read': 1, 'write': 3})
+
+        self.assertEqual(middleware(self.request('post')).status_code, 200)
+        self.assertEqual(middleware(self.request('post')).status_code, 429)
+
+    def test_overload_returns_503_and_keeps_reserved_slots_for_reads(self):
+        middleware = self.middleware(
+            BURST=100, MAX_CONCURRENT=2, RESERVED_FOR_READS=1, QUEUE_BUDGET={'read': 0, 'write': 0}
+        )
+        middleware.concurrency.acquire('sub:otro', 'write', 0)
+
+        write = middleware(self.request('post'))
+        self.assertEqual(write.status_code, 503)
+        self.assertIn('Retry-After', write)
+        self.assertEqual(middleware(self.request()).status_code, 200)
+
+    def test_rejected_concurrent_requests_do_not_use_rate_tokens(self):
+        for backend in ['local', 'cache']:
+            with self.subTest(backend=backend):
+                cache.clear()
+                middleware = self.middleware(BACKEND=backend, RATE=0.1, MAX_CONCURRENT_PER_TOKEN=1)
+                middleware.concurrency.acquire('sub:usuario', 'read', 0)
+
+                for _ in range(5):
+                    self.assertEqual(middleware(self.request()).status_code, 429)
+                middleware.concurrency.release('sub:usuario')
+
+                self.assertEqual([middleware(self.request()).status_code for _ in range(3)], [200, 200, 200])
+
+    def test_refilled_buckets_are_dropped(self):
+        limiter = LocalRateLimiter(rate=10, burst=5)
+        with mock.patch('exercises.middleware.time.monotonic', return_value=limiter.next_sweep - 0.1):
+            for client in range(100):
+                limiter.consume(f'ip:{client}', 1)
+            limiter.consume('ip:activo', 5)
+        self.assertEqual(len(limiter.buckets), 101)
+
+        # Las cubetas que gastaron 1 token ya se llenaron; la que quedó vacía todavía no
+        with mock.patch('exercises.middleware.time.monotonic', return_value=limiter.next_sweep + 0.05):
+            limiter.consume('ip:nuevo', 1)
+        self.assertEqual(set(limiter.buckets), {'ip:activo', 'ip:nuevo'})
+
+    def test_permission_still_requires_valid_active_token(self):
+        client = APIClient()
+        self.assertEqual(client.get('/exercises/all/').status_code, 403)
+
+        client.credentials(HTTP_AUTHORIZATION='Bearer no-es-un-token')
+        self.assertEqual(client.get('/exercises/all/').status_code, 403)
+
+        token = jwt.encode({'sub': 'usuario', 'is_active': False}, settings.SECRET_KEY, algorithm='HS256')
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(client.get('/exercises/all/').status_code, 403)
+
+        self.assertEqual(api_client().get('/exercises/all/').status_code, 200)
+
+
+class ActiveNameUniquenessTests(TestCase):
+    def test_create_duplicate_active_name_is_rejected(self):
+        Exercise.objects.create(**exercise_data('Sentadilla'))
+
+        serializer = ExerciseCreateSerializer(data=exercise_data('sentadilla'))
+        self.assertTrue(serializer.is_valid())
+
+        with self.assertRaises(ValidationError) as context:
+            serializer.save()
+
+        self.assertEqual(
+            context.exception.detail,
+            {'name': ["Lo siento, ya existe un ejercicio activo con este nombre."]}
+        )
+
+    def test_inactive_exercise_does_not_block_name(self):
+        Exercise.objects.create(is_active=False, **exercise_data('Sentadilla'))
+
+        serializer = ExerciseCreateSerializer(data=exercise_data('Sentadilla'))
+        self.assertTrue(serializer.is_valid())
+        serializer.save()
+
+        self.assertEqual(Exercise.objects.filter(name='Sentadilla').count(), 2)
+
+    def test_update_to_duplicate_active_name_is_rejected(self):
+        Exercise.objects.create(**exercise_data('Sentadilla'))
+        other = Exercise.objects.create(**exercise_data('Zancada'))
+
+        serializer = ExerciseUpdateSerializer(other, data={'name': 'SENTADILLA'}, partial=True)
+        self.assertTrue(serializer.is_valid())
+
+        with self.assertRaises(ValidationError) as context:
+            serializer.save()
+
+        self.assertEqual(
+            context.exception.detail,
+            {'name': ["Ya existe otro ejercicio activo con este nombre."]}
+        )
+
+
+class ConcurrentCreateTests(TransactionTestCase):
+    def test_parallel_creates_with_same_name_cannot_both_succeed(self):
+        workers = 4
+        barrier = threading.Barrier(workers)
+        results = []
+
+        def create():
+            try:
+                serializer = ExerciseCreateSerializer(data=exercise_data('Plancha'))
+                serializer.is_valid(raise_exception=True)
+                barrier.wait()
+                try:
+                    serializer.save()
+                    results.append('created')
+                except ValidationError as error:
+                    results.append(error.detail)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=create) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count('created'), 1)
+        self.assertEqual(Exercise.objects.filter(name__iexact='Plancha', is_active=True).count(), 1)
+        for result in results:
+            if result != 'created':
+                self.assertEqual(
+                    result,
+                    {'name': ["Lo siento, ya existe un ejercicio activo con este nombre."]}
+                )
+
+
+class TelemetryBufferTests(TestCase):
+    def setUp(self):
+        self.exercise = Exercise.objects.create(**exercise_data('Sentadilla'))
+
+    def rep(self, number):
+        return RepResult(
+            exercise=self.exercise,
+            user_sub='usuario',
+            rep_number=number,
+            joint_deviations={'rodilla': 4.5},
+            mistakes=['Rodillas hacia adentro'],
+            recorded_at=timezone.now()
+        )
+
+    def test_flush_writes_pending_records_in_batches(self):
+        buffer = TelemetryBuffer(batch_size=2, flush_interval=60, max_buffer=10)
+        buffer.pending.extend(self.rep(i) for i in range(5))
+
+        self.assertEqual(buffer.flush(), 5)
+        self.assertEqual(RepResult.objects.count(), 5)
+        self.assertEqual(len(buffer.pending), 0)
+
+    def test_rejected_rows_are_dead_lettered_without_blocking_the_buffer(self):
+        buffer = TelemetryBuffer(batch_size=10, flush_interval=60, max_buffer=10)
+        invalid = self.rep(2)
+        invalid.rep_number = None
+        buffer.pending.extend([self.rep(0), self.rep(1), invalid, self.rep(3), self.rep(4)])
+
+        with self.assertLogs('exercises.telemetry.dead_letter', 'ERROR') as logs:
+            self.assertEqual(buffer.flush(), 4)
+
+        self.assertEqual(sorted(RepResult.objects.values_list('rep_number', flat=True)), [0, 1, 3, 4])
+        self.assertEqual(len(buffer.pending), 0)
+        self.assertEqual(buffer.rejected, 1)
+        self.assertEqual(len(logs.records), 1)
+
+    def test_add_rejects_records_when_buffer_is_full(self):
+        buffer = TelemetryBuffer(batch_size=100, flush_interval=60, max_buffer=3)
+        buffer.pending.extend(self.rep(i) for i in range(3))
+
+        with self.assertRaises(BufferFull):
+            buffer.add([self.rep(3)])
+
+
+class RepResultIngestTests(TestCase):
+    def setUp(self):
+        self.client = api_client()
+        self.exercise = Exercise.objects.create(**exercise_data('Sentadilla'))
+        self.buffer = TelemetryBuffer(batch_size=100, flush_interval=60, max_buffer=100)
+        patcher = mock.patch('exercises.views.get_buffer', return_value=self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, body):
+        return self.client.post('/exercises/telemetry/', body, format='json')
+
+    def result(self, exercise_id, **overrides):
+        return {
+            'exercise_id': str(exercise_id),
+            'rep_number': 1,
+            'joint_deviations': {'rodilla': 4.5},
+            'recorded_at': timezone.now().isoformat(),
+            **overrides,
+        }
+
+    def test_results_are_accepted_into_the_buffer(self):
+        response = self.post({'results': [self.result(self.exercise.id), self.result(self.exercise.id)]})
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data, {'accepted': 2})
+        self.assertEqual([r.user_sub for r in self.buffer.pending], ['usuario', 'usuario'])
+        self.assertEqual(self.post([self.result(self.exercise.id)]).status_code, 202)
+
+    def test_malformed_bodies_are_rejected(self):
+        for body in ['x', 5, {}, [], {'results': 'x'}]:
+            with self.subTest(body=body):
+                self.assertEqual(self.post(body).status_code, 400)
+
+    def test_unknown_or_inactive_exercises_are_rejected(self):
+        inactive = Exercise.objects.create(is_active=False, **exercise_data('Plancha'))
+        for exercise_id in [uuid.uuid4(), inactive.id]:
+            with self.subTest(exercise_id=exercise_id):
+                response = self.post([self.result(self.exercise.id), self.result(exercise_id)])
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(str(exercise_id), response.data['error'])
+        self.assertEqual(len(self.buffer.pending), 0)
+
+    def test_full_buffer_returns_503_with_retry_after(self):
+        with mock.patch.object(self.buffer, 'add', side_effect=BufferFull):
+            response = self.post([self.result(self.exercise.id)])
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
+
+
+class RepResultValidationTests(TestCase):
+    def data(self, **overrides):
+        return {
+            'exercise_id': str(uuid.uuid4()),
+            'rep_number': 1,
+            'recorded_at': timezone.now().isoformat(),
+            **overrides,
+        }
+
+    def test_rep_number_must_fit_the_column(self):
+        self.assertTrue(RepResultSerializer(data=self.data(rep_number=2 ** 31 - 1)).is_valid())
+        self.assertFalse(RepResultSerializer(data=self.data(rep_number=2 ** 31)).is_valid())
+
+    def test_recorded_at_must_be_recent(self):
+        now = timezone.now()
+        for recorded_at, valid in [
+            (now - timedelta(days=29), True),
+            (now - timedelta(days=31), False),
+            (now + timedelta(days=365), False),
+        ]:
+            with self.subTest(recorded_at=recorded_at):
+                serializer = RepResultSerializer(data=self.data(recorded_at=recorded_at.isoformat()))
+                self.assertEqual(serializer.is_valid(), valid)
+
+
+class RollupTests(TestCase):
+    def test_rollups_accumulate_across_batches(self):
+        exercise = Exercise.objects.create(**exercise_data('Sentadilla'))
+        result = RepResult(
+            exercise=exercise,
+            user_sub='usuario',
+            rep_number=1,
+            joint_deviations={'rodilla': -3.0},
+            mistakes=['Rodillas hacia adentro'],
+            recorded_at=timezone.now()
+        )
+
+        update_rollups([result, result])
+        update_rollups([result])
+
+        rollups = {r.kind: r for r in ExerciseDailyRollup.objects.filter(exercise=exercise)}
+        self.assertEqual(rollups['reps'].count, 3)
+        self.assertEqual(rollups['joint'].count, 3)
+        self.assertEqual(rollups['joint'].total, 9.0)
+        self.assertEqual(rollups['mistake'].count, 3)
+
+
+class ExerciseStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = api_client()
+        self.squat = Exercise.objects.create(**exercise_data('Sentadilla'))
+        self.plank = Exercise.objects.create(**{**exercise_data('Plancha'), 'difficulty': 'avanzado'})
+        today = timezone.now().date()
+
+        ExerciseDailyRollup.objects.bulk_create([
+            ExerciseDailyRollup(exercise=self.squat, day=today, kind='reps', count=10),
+            ExerciseDailyRollup(exercise=self.squat, day=today, kind='joint', label='rodilla', count=10, total=50),
+            ExerciseDailyRollup(exercise=self.squat, day=today, kind='mistake', label='Talones arriba', count=2),
+            ExerciseDailyRollup(exercise=self.squat, day=today, kind='mistake', label='Rodillas adentro', count=6),
+            # Fuera de la ventana de 7 días
+            ExerciseDailyRollup(exercise=self.squat, day=today - timedelta(days=10), kind='reps', count=100),
+            ExerciseDailyRollup(exercise=self.plank, day=today, kind='reps', count=4),
+        ])
+
+    def stats(self, **query):
+        response = self.client.get('/exercises/stats/', query)
+        self.assertEqual(response.status_code, 200)
+        return {entry['name']: entry for entry in response.data['results']}
+
+    def test_window_limits_the_days_aggregated(self):
+        self.assertEqual(self.stats(days=7)['Sentadilla']['reps'], 10)
+        self.assertEqual(self.stats(days=30)['Sentadilla']['reps'], 110)
+
+    def test_joint_deviation_and_top_mistakes(self):
+        squat = self.stats(days=7)['Sentadilla']
+
+        self.assertEqual(squat['joints'], [{'joint': 'rodilla', 'avg_deviation': 5.0, 'samples': 10}])
+        self.assertEqual(squat['top_mistakes'], [
+            {'mistake': 'Rodillas adentro', 'count': 6},
+            {'mistake': 'Talones arriba', 'count': 2},
+        ])
+
+    def test_difficulty_and_exercise_filters(self):
+        self.assertEqual(set(self.stats(difficulty='avanzado')), {'Plancha'})
+        self.assertEqual(set(self.stats(exercise=str(self.squat.id))), {'Sentadilla'})
+
+    def test_invalid_parameters_are_rejected(self):
+        for query in [{'days': 0}, {'days': 'x'}, {'exercise': 'no-es-uuid'}, {'difficulty': 'experto'}]:
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get('/exercises/stats/', query).status_code, 400)
+
+
+class JointAngleTests(TestCase):
+    def test_parse_ideal_angles_supported_shapes(self):
+        self.assertEqual(
+            parse_ideal_angles({
+                'Rodilla': {'target': 90, 'tolerance': 10},
+                'cadera': 120,
+                'codo': {'min': 30, 'max': 50},
+                'hombro': 'sin dato',
+            }),
+            {'rodilla': (90.0, 10.0), 'cadera': (120.0, 0.0), 'codo': (40.0, 10.0)}
+        )
+        self.assertEqual(parse_ideal_angles([{'joint': 'rodilla', 'angle': 80}]), {'rodilla': (80.0, 0.0)})
+
+    def test_serializers_keep_joint_angles_in_sync(self):
+        serializer = ExerciseCreateSerializer(data=exercise_data('Sentadilla'))
+        serializer.is_valid(raise_exception=True)
+        exercise = serializer.save()
+        self.assertEqual(list(exercise.joint_angles.values_list('joint', 'target')), [('rodilla', 90.0)])
+
+        serializer = ExerciseUpdateSerializer(exercise, data={'ideal_angles': {'codo': 45}}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assertEqual(list(ExerciseJointAngle.objects.values_list('joint', 'target')), [('codo', 45.0)])
+
+
+class JointFilterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = api_client()
+        Exercise.objects.create(**exercise_data('Sentadilla'))
+        Exercise.objects.create(**{**exercise_data('Sentadilla profunda'), 'ideal_angles': {'rodilla': 60}})
+        Exercise.objects.create(**{**exercise_data('Curl'), 'ideal_angles': {'codo': 45}})
+        Exercise.objects.create(is_active=False, **exercise_data('Sentadilla vieja'))
+        for exercise in Exercise.objects.all():
+            sync_joint_angles(exercise)
+
+    def names(self, **query):
+        response = self.client.get('/exercises/joint/', query)
+        self.assertEqual(response.status_code, 200)
+        return sorted(e['name'] for e in response.data)
+
+    def test_filters_active_exercises_by_joint_and_angle_range(self):
+        self.assertEqual(self.names(joint='Rodilla'), ['Sentadilla', 'Sentadilla profunda'])
+        self.assertEqual(self.names(joint='rodilla,codo', max_angle='70'), ['Curl', 'Sentadilla profunda'])
+        self.assertEqual(self.names(joint='rodilla', min_angle='80', max_angle='100'), ['Sentadilla'])
+
+    def test_invalid_parameters_are_rejected(self):
+        for query in [{}, {'joint': 'rodilla', 'max_angle': 'x'},
+                      {'joint': 'rodilla', 'max_angle': 'nan'}, {'joint': 'rodilla', 'min_angle': '-inf'}]:
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get('/exercises/joint/', query).status_code, 400)
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def request(self, query):
+        return Request(APIRequestFactory().get('/exercises/muscle-group/', query))
+
+    def compute(self):
+        self.calls += 1
+        return Response({'calls': self.calls})
+
+    def test_equivalent_filters_share_entry_until_catalog_changes(self):
+        first = cached_response('test', self.request({'muscle_group': 'pierna,gluteo'}), self.compute)
+        second = cached_response('test', self.request({'muscle_group': ['gluteo', 'pierna']}), self.compute)
+        self.assertEqual((first['X-Cache'], second['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(self.calls, 1)
+
+        bump_catalog_version()
+        third = cached_response('test', self.request({'muscle_group': 'pierna,gluteo'}), self.compute)
+        self.assertEqual(third['X-Cache'], 'MISS')
+        self.assertEqual(self.calls, 2)
+
+    def test_order_sensitive_params_keep_separate_entries(self):
+        for name, first, second in [
+            ('ordering', '-name,created_at', 'created_at,-name'),
+            ('name', 'a,b', 'b,a'),
+            ('fields', 'name,id', 'id,name'),
+        ]:
+            with self.subTest(param=name):
+                self.assertNotEqual(
+                    _cache_key('test', self.request({name: first})),
+                    _cache_key('test', self.request({name: second}))
+                )
+
+    def test_list_with_different_orderings_is_not_served_from_the_same_entry(self):
+        client = api_client()
+        exercises = [Exercise.objects.create(**exercise_data(name)) for name in ['Aaa', 'Bbb', 'Ccc']]
+
+        first = client.get('/exercises/all/', {'ordering': '-name,id'})
+        second = client.get('/exercises/all/', {'ordering': 'id,-name'})
+
+        self.assertEqual(second['X-Cache'], 'MISS')
+        self.assertEqual([e['name'] for e in first.data], ['Ccc', 'Bbb', 'Aaa'])
+        self.assertEqual(
+            [e['name'] for e in second.data],
+            [e.name for e in sorted(exercises, key=lambda e: str(e.id))]
+        )
+
+    def test_process_local_cache_is_not_used_for_responses(self):
+        with mock.patch('exercises.cache.cache', LocMemCache('local', {})):
+            first = cached_response('test', self.request({'muscle_group': 'pierna'}), self.compute)
+            second = cached_response('test', self.request({'muscle_group': 'pierna'}), self.compute)
+
+        self.assertEqual((first['X-Cache'], second['X-Cache']), ('BYPASS', 'BYPASS'))
+        self.assertEqual(self.calls, 2)
+
+    def test_stale_response_is_served_while_another_worker_recomputes(self):
+        request = self.request({'muscle_group': 'pierna'})
+        cached_response('test', request, self.compute)
+        bump_catalog_version()
+
+        # Otro proceso tiene el candado de recálculo de esta llave
+        cache.add(f"{_cache_key('test', request)}:lock", 1)
+        response = cached_response('test', request, self.compute)
+
+        self.assertEqual(response['X-Cache'], 'STALE')
+        self.assertEqual(response.data, {'calls': 1})
+        self.assertEqual(self.calls, 1)
+
+
+class ImageDeduplicationTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+
+        settings_override = override_settings(
+            EXERCISE_IMAGE_STORAGE='exercises.images.FileSystemImageStorage',
+            EXERCISE_IMAGE_ROOT=self.root
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def png(self, name='demo.png'):
+        buffer = io.BytesIO()
+        Image.new('RGB', (640, 480), 'red').save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def create(self, name, image):
+        serializer = ExerciseCreateSerializer(data={**exercise_data(name), 'image': image})
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def test_same_image_is_stored_once(self):
+        first = self.create('Sentadilla', self.png())
+        second = self.create('Zancada', self.png('otra.png'))
+
+        self.assertEqual(ImageAsset.objects.count(), 1)
+        self.assertEqual(len(list((self.root / 'exercises').iterdir())), 1)
+        self.assertEqual(str(first.image), str(second.image))
+
+    def test_upload_is_streamed_to_storage_and_thumbnails_reread_it(self):
+        upload = self.png()
+        content = upload.read()
+        upload.seek(0)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.create('Sentadilla', upload)
+        asset = ImageAsset.objects.get()
+
+        self.assertEqual((self.root / asset.stored).read_bytes(), content)
+        self.assertEqual((asset.size, asset.width, asset.height), (len(content), 640, 480))
+
+        # El trabajo de miniaturas recibe la ruta guardada, no el contenido del archivo
+        executor = mock.Mock()
+        with mock.patch('exercises.images._get_executor', return_value=executor):
+            for callback in callbacks:
+                callback()
+        executor.submit.assert_called_once_with(_thumbnail_job, asset.sha256, asset.stored)
+
+    def test_thumbnails_are_generated_locally(self):
+        self.create('Sentadilla', self.png())
+        asset = ImageAsset.objects.get()
+
+        thumbnails = generate_thumbnails(asset.sha256, asset.stored)
+
+        self.assertEqual(set(thumbnails), {'320', '96'})
+        with Image.open(self.root / thumbnails['96']) as thumbnail:
+            self.assertEqual(max(thumbnail.size), 96)
+
+
+class CatalogImportExportTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+
+    def test_round_trip_is_idempotent(self):
+        for extension in ['jsonl', 'csv']:
+            with self.subTest(extension=extension):
+                Exercise.objects.all().delete()
+                original = Exercise.objects.create(**exercise_data('Sentadilla'))
+                path = self.root / f'catalogo.{extension}'
+
+                call_command('export_exercises', str(path), stderr=io.StringIO())
+                Exercise.objects.filter(id=original.id).update(name='Cambiado')
+                call_command('import_exercises', str(path), stdout=io.StringIO(), stderr=io.StringIO())
+                call_command('import_exercises', str(path), stdout=io.StringIO(), stderr=io.StringIO())
+
+                exercise = Exercise.objects.get()
+                self.assertEqual(exercise.id, original.id)
+                self.assertEqual(exercise.name, 'Sentadilla')
+                self.assertEqual(exercise.ideal_angles, {'rodilla': 90})
+                self.assertEqual(list(exercise.joint_angles.values_list('joint', flat=True)), ['rodilla'])
+
+    def test_restore_keeps_file_timestamps(self):
+        original = Exercise.objects.create(**exercise_data('Sentadilla'))
+        old = timezone.now().replace(year=2020)
+        Exercise.objects.filter(id=original.id).update(created_at=old, updated_at=old)
+        path = self.root / 'catalogo.jsonl'
+
+        call_command('export_exercises', str(path), stderr=io.StringIO())
+        Exercise.objects.all().delete()
+        call_command('import_exercises', str(path), stdout=io.StringIO(), stderr=io.StringIO())
+
+        exercise = Exercise.objects.get()
+        self.assertEqual((exercise.created_at, exercise.updated_at), (old, old))
+
+    def test_jsonl_booleans_and_repeated_ids(self):
+        exercise_id = '0f8fad5b-d9cb-469f-a165-70867728950e'
+        rows = [
+            {'id': exercise_id, 'is_active': 'false', **exercise_data('Plancha')},
+            {'id': exercise_id, 'is_active': 'false', **exercise_data('Plancha lateral')},
+        ]
+        path = self.root / 'catalogo.jsonl'
+        path.write_text(''.join(json.dumps(row) + '\n' for row in rows), encoding='utf-8')
+
+        call_command('import_exercises', str(path), stdout=io.StringIO(), stderr=io.StringIO())
+
+        exercise = Exercise.objects.get()
+        self.assertEqual(exercise.name, 'Plancha lateral')
+        self.assertFalse(exercise.is_active)
+
+    def test_catalog_version_is_bumped_when_import_fails(self):
+        path = self.root / 'catalogo.jsonl'
+        path.write_text(json.dumps({'id': str(uuid.uuid4()), **exercise_data('Plancha')}) + '\n{roto\n')
+        version = get_catalog_version()
+
+        with self.assertRaises(CommandError):
+            call_command('import_exercises', str(path), batch_size=1, stdout=io.StringIO(), stderr=io.StringIO())
+
+        self.assertEqual(Exercise.objects.count(), 1)
+        self.assertGreater(get_catalog_version(), version)
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        path = self.root / 'catalogo.jsonl'
+        path.write_text(
+            '{"id": "no-es-uuid", "name": "Plancha"}\n'
+            '{"id": "0f8fad5b-d9cb-469f-a165-70867728950e", "name": "Plancha", "muscle_group": "cola",'
+            ' "difficulty": "avanzado", "equipment": "cuerpo", "ideal_angles": {"cadera": 180},'
+            ' "common_mistakes": ["Cadera caída"]}\n',
+            encoding='utf-8'
+        )
+        stderr = io.StringIO()
+
+        call_command('import_exercises', str(path), stdout=io.StringIO(), stderr=stderr)
+
+        self.assertFalse(Exercise.objects.exists())
+        self.assertIn('Fila 1', stderr.getvalue())
+        self.assertIn('Opción de grupo muscular no válida.', stderr.getvalue())
+
+
+def knee_keypoints(knee_angles):
+    # Solo la pierna izquierda: cadera arriba de la rodilla y tobillo girado según el ángulo
+    keypoints = np.zeros((len(knee_angles), 33, 2), dtype=np.float32)
+    radians = np.radians(knee_angles)
+    keypoints[:, LEFT_HIP] = [0, 1]
+    keypoints[:, LEFT_ANKLE, 0] = np.sin(radians)
+    keypoints[:, LEFT_ANKLE, 1] = np.cos(radians)
+    keypoints[:, LEFT_KNEE] = [0, 0]
+    return keypoints
+
+
+class ScoringTests(TestCase):
+    def test_joint_angles_are_measured_at_the_vertex(self):
+        angles = joint_angles(knee_keypoints([90, 120, 180]), 'rodilla_izquierda')
+        np.testing.assert_allclose(angles, [90, 120, 180], atol=1e-3)
+
+    def test_score_is_share_of_frames_within_tolerance(self):
+        result = score_keypoints(knee_keypoints([85, 95, 130, 170]), {'rodilla_izquierda': (90, 10)})
+
+        self.assertEqual(result['frames'], 4)
+        self.assertEqual(result['score'], 50.0)
+        self.assertEqual(result['joints']['rodilla_izquierda']['within_tolerance'], 0.5)
+
+    def test_plain_target_uses_default_tolerance(self):
+        targets = parse_ideal_angles({'rodilla_izquierda': 90})
+        keypoints = knee_keypoints([85, 95, 130, 170])
+
+        self.assertEqual(score_keypoints(keypoints, targets)['score'], 50.0)
+        self.assertEqual(score_keypoints(keypoints, targets, default_tolerance=3)['score'], 0.0)
+
+
+class ScoreSessionsResumeTests(TestCase):
+    def test_errored_and_truncated_sessions_are_not_done(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        output = Path(directory.name) / 'resultados.jsonl'
+        output.write_text(
+            '{"session": "a/1.npy", "score": 80.0}\n'
+            '{"session": "a/2.npy", "error": "archivo corrupto"}\n'
+            '{"session": "a/3.npy", "error": "sin memoria"}\n'
+            '{"session": "a/3.npy", "score": 75.0}\n'
+            '{"session": "a/4.npy", "sco',
+            encoding='utf-8'
+        )
+
+        done = ScoreSessionsCommand()._completed(output)
+
+        self.assertEqual(done, {'a/1.npy', 'a/3.npy'})
+        self.assertTrue(output.read_text(encoding='utf-8').endswith('"score": 75.0}\n'))
+
+
+class ScoreSessionsCommandTests(TransactionTestCase):
+    # TransactionTestCase porque el comando cierra las conexiones antes de crear los procesos
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        self.sessions = self.root / 'sesiones'
+        self.output = self.root / 'resultados.jsonl'
+
+        exercise = Exercise.objects.create(**{
+            **exercise_data('Sentadilla'),
+            'ideal_angles': {'rodilla_izquierda': 90},
+        })
+        self.exercise_dir = self.sessions / str(exercise.id)
+        self.exercise_dir.mkdir(parents=True)
+
+        squats = [175 - 42.5 * (1 - math.cos(2 * math.pi * i / 60)) for i in range(180)]
+        np.save(self.exercise_dir / '1.npy', knee_keypoints(squats))
+        np.save(self.exercise_dir / '2.npy', knee_keypoints(squats[:120]))
+        (self.exercise_dir / '3.npy').write_bytes(b'no es un arreglo')
+        (self.sessions / 'sin-ejercicio').mkdir()
+        np.save(self.sessions / 'sin-ejercicio' / '4.npy', knee_keypoints(squats))
+
+    def score(self):
+        call_command('score_sessions', str(self.sessions), output=str(self.output), workers=2, stdout=io.StringIO())
+        return [json.loads(line) for line in self.output.read_text(encoding='utf-8').splitlines()]
+
+    def test_scores_in_parallel_and_resumes_failed_sessions(self):
+        results = {Path(r['session']).name: r for r in self.score()}
+
+        self.assertEqual(set(results), {'1.npy', '2.npy', '3.npy'})
+        self.assertIn('error', results['3.npy'])
+        self.assertGreater(results['1.npy']['score'], 0)
+        self.assertEqual(results['1.npy']['reps']['count'], 3)
+        self.assertEqual(results['2.npy']['reps']['count'], 2)
+
+        # Al reanudar solo se puntúa la sesión que falló
+        np.save(self.exercise_dir / '3.npy', knee_keypoints([175, 90, 175]))
+        results = self.score()
+
+        self.assertEqual(len(results), 4)
+        self.assertEqual(Path(results[-1]['session']).name, '3.npy')
+        self.assertNotIn('error', results[-1])
+
+
+class RepCounterTests(TestCase):
+    def squats(self, reps, depth=90, frames_per_rep=60):
+        # Rodilla de 175° hasta depth y de regreso, frames_per_rep frames por repetición
+        amplitude = (175 - depth) / 2
+        return [
+            175 - amplitude * (1 - math.cos(2 * math.pi * i / frames_per_rep))
+            for i in range(reps * frames_per_rep)
+        ]
+
+    def test_counts_reps_with_tempo_and_range_of_motion(self):
+        reps = count_reps(self.squats(5), fps=30, target=90, tolerance=10)
+
+        self.assertEqual(len(reps), 5)
+        for rep in reps:
+            self.assertTrue(rep['reached_target'])
+            self.assertAlmostEqual(rep['range_of_motion'], 85, delta=3)
+            self.assertLess(rep['duration_seconds'], 2)
+            self.assertGreater(rep['eccentric_seconds'], 0)
+
+    def test_shallow_reps_report_shortfall(self):
+        reps = count_reps(self.squats(3, depth=130), target=90, tolerance=10)
+
+        self.assertEqual(len(reps), 3)
+        self.assertFalse(reps[0]['reached_target'])
+        self.assertAlmostEqual(reps[0]['shortfall'], 30, delta=2)
+
+    def test_stream_starting_past_the_target(self):
+        # La grabación empieza en el fondo de una sentadilla, por debajo del ángulo ideal
+        reps = count_reps(self.squats(5)[30:], fps=30, target=90, tolerance=10)
+
+        self.assertEqual(len(reps), 4)
+        for rep in reps:
+            self.assertTrue(rep['reached_target'])
+            self.assertAlmostEqual(rep['top_angle'], 175, delta=3)
+            self.assertAlmostEqual(rep['extreme_angle'], 90, delta=3)
+            self.assertAlmostEqual(rep['eccentric_seconds'], rep['concentric_seconds'], delta=0.2)
+
+        shallow = count_reps(self.squats(3, depth=130)[30:], target=90, tolerance=10)
+        self.assertEqual(len(shallow), 2)
+        self.assertAlmostEqual(shallow[0]['shortfall'], 30, delta=2)
+
+    def test_extension_starting_at_rest(self):
+        # Extensión de codo: reposo a 60° y ángulo ideal a 170°
+        angles = [240 - angle for angle in self.squats(3, depth=70)]
+        reps = count_reps(angles, target=170, tolerance=10)
+
+        self.assertEqual(len(reps), 3)
+        self.assertAlmostEqual(reps[0]['top_angle'], 65, delta=3)
+        self.assertTrue(all(rep['reached_target'] for rep in reps))
+
+    def test_primary_joint_does_not_depend_on_stored_key_order(self):
+        exercise = Exercise.objects.create(**{
+            **exercise_data('Sentadilla'),
+            'ideal_angles': {'primary': 'rodilla', 'rodilla': 90, 'cadera': 120},
+        })
+        exercise.refresh_from_db()
+        # Así devuelve PostgreSQL un jsonb: llaves más cortas primero
+        reordered = {key: exercise.ideal_angles[key] for key in sorted(exercise.ideal_angles, key=len)}
+
+        for ideal_angles in [exercise.ideal_angles, reordered]:
+            joint, counter = RepCounter.from_targets(parse_ideal_angles(ideal_angles))
+            self.assertEqual((joint, counter.target), ('rodilla', 90.0))
+
+        # Sin llave primary la regla es el orden alfabético; en una lista, el orden de la lista
+        self.assertEqual(next(iter(parse_ideal_angles({'rodilla': 90, 'cadera': 120}))), 'cadera')
+        self.assertEqual(
+            next(iter(parse_ideal_angles([{'joint': 'rodilla', 'angle': 90}, {'joint': 'cadera', 'angle': 120}]))),
+            'rodilla'
+        )
+
+    def test_streaming_matches_batch(self):
+        angles = self.squats(4)
+        counter = RepCounter(target=90, tolerance=10)
+        streamed = [
+            rep for rep in (counter.update(angle, i / 30) for i, angle in enumerate(angles))
+            if rep is not None
+        ]
+
+        self.assertEqual(streamed, count_reps(angles, fps=30, target=90, tolerance=10))
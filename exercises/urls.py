@@ -8,6 +8,9 @@ urlpatterns = [
     # Obtener, actualizar o eliminar por ID
     path('<uuid:id>/', views.ExerciseDetailView.as_view(), name='exercise-detail'),
 
+    # Obtener varios por ID en una sola petición
+    path('batch/', views.exercise_batch, name='exercise-batch'),
+
     # Buscar por nombre
     path('search/', views.exercise_search_by_name, name='exercise-search'),
 
@@ -15,4 +18,14 @@ urlpatterns = [
     path('muscle-group/', views.exercise_list_by_muscle_group, name='exercise-muscle-group'),
     path('difficulty/', views.exercise_list_by_difficulty, name='exercise-difficulty'),
     path('equipment/', views.exercise_list_by_equipment, name='exercise-equipment'),
+    path('joint/', views.exercise_list_by_joint, name='exercise-joint'),
+
+    # Registrar resultados de repeticiones
+    path('telemetry/', views.rep_result_ingest, name='exercise-telemetry'),
+
+    # Estadísticas de errores y desviaciones por ejercicio
+    path('stats/', views.exercise_stats, name='exercise-stats'),
+
+    # Métricas de la cache de respuestas
+    path('cache-stats/', views.exercise_cache_stats, name='exercise-cache-stats'),
 ]
\ No newline at end of file
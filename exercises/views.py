@@ -1,12 +1,78 @@
+import hashlib
+import math
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
 from django.core.serializers import serialize
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from django.db.models import Q
-from .models import Exercise
-from .serializers import ExerciseSerializer, ExerciseCreateSerializer, ExerciseListSerializer, ExerciseUpdateSerializer
-from .permissions import IsAuthenticated
+from django.db.models import Q, Sum
+from django.utils import timezone
+from .models import Exercise, ExerciseDailyRollup, ExerciseJointAngle, RepResult
+from .serializers import ExerciseSerializer, ExerciseCreateSerializer, ExerciseListSerializer, ExerciseUpdateSerializer, \
+    RepResultSerializer
+from .cache import cached_response, cached_view, get_cache_stats
+from .permissions import IsAuthenticated, get_token_payload
+from .telemetry import BufferFull, get_buffer
+
+# Máximo de ids aceptados por el endpoint de búsqueda por lote
+BATCH_MAX_IDS = 50
+
+# Máximo de resultados de repeticiones aceptados por petición
+TELEMETRY_MAX_RECORDS = 1000
+
+# Ventana (en días) de las estadísticas por ejercicio
+STATS_DEFAULT_DAYS = 30
+STATS_MAX_DAYS = 365
+
+
+def _build_etag(*parts):
+    # ETag calculado a partir de ids y fechas de actualización
+    digest = hashlib.md5('|'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+    return quote_etag(digest)
+
+
+def _parse_fields(request, serializer_class):
+    # Lee ?fields= y valida que todos los campos existan en el serializer
+    raw = request.query_params.get('fields', '').strip()
+    if not raw:
+        return None, None
+
+    fields = [f.strip() for f in raw.split(',') if f.strip()]
+    valid_fields = serializer_class.Meta.fields
+    invalid = [f for f in fields if f not in valid_fields]
+
+    if invalid:
+        return None, Response(
+            {"error": f"Campos no válidos: {invalid}. Opciones: {valid_fields}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return fields, None
+
+
+def _sparse_list_response(request, queryset, serializer_class=ExerciseListSerializer):
+    # Serializa solo los campos pedidos y limita las columnas del SELECT
+    fields, error = _parse_fields(request, serializer_class)
+    if error:
+        return error
+
+    if fields:
+        queryset = queryset.only(*serializer_class.model_columns(fields))
+
+    serializer = serializer_class(queryset, many=True, fields=fields)
+    return Response(serializer.data)
+
+
+def _set_conditional_headers(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
 
 
 class ExerciseListCreateView(generics.ListCreateAPIView):
@@ -24,6 +90,13 @@ class ExerciseListCreateView(generics.ListCreateAPIView):
             return ExerciseCreateSerializer
         return ExerciseListSerializer
 
+    def list(self, request, *args, **kwargs):
+        return cached_response(
+            'exercise-list',
+            request,
+            lambda: _sparse_list_response(request, self.filter_queryset(self.get_queryset()))
+        )
+
 
 class ExerciseDetailView(generics.RetrieveUpdateDestroyAPIView):
     """
@@ -42,6 +115,27 @@ class ExerciseDetailView(generics.RetrieveUpdateDestroyAPIView):
             return ExerciseUpdateSerializer
         return ExerciseListSerializer
 
+    def retrieve(self, request, *args, **kwargs):
+        fields, error = _parse_fields(request, ExerciseListSerializer)
+        if error:
+            return error
+
+        if fields:
+            # updated_at siempre se carga porque lo necesitan ETag y Last-Modified
+            columns = ExerciseListSerializer.model_columns(fields) + ['updated_at']
+            self.queryset = self.queryset.only(*columns)
+        instance = self.get_object()
+
+        # Soporte para peticiones condicionales (If-None-Match / If-Modified-Since)
+        etag = _build_etag(instance.id, instance.updated_at.isoformat(), *(fields or []))
+        last_modified = int(instance.updated_at.timestamp())
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        serializer = self.get_serializer(instance, fields=fields)
+        return _set_conditional_headers(Response(serializer.data), etag, last_modified)
+
     def perform_destroy(self, instance):
         # Soft delete - cambia is_active a False en lugar de eliminar
         instance.is_active = False
@@ -50,6 +144,96 @@ class ExerciseDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+def exercise_batch(request):
+    """
+    GET: Obtiene varios ejercicios por ID en una sola consulta, en el orden solicitado
+    """
+    ids = request.query_params.getlist('ids')
+
+    if len(ids) == 1 and ',' in ids[0]:
+        ids = [i.strip() for i in ids[0].split(',')]
+
+    ids = [i for i in ids if i]
+
+    if not ids:
+        return Response(
+            {"error": "Necesitas ingresar al menos un id"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    # El límite se aplica antes de interpretar los ids, incluidos los repetidos
+    if len(ids) > BATCH_MAX_IDS:
+        return Response(
+            {"error": f"Solo puedes solicitar hasta {BATCH_MAX_IDS} ejercicios a la vez"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    requested = {}
+    invalid = []
+    for raw in ids:
+        try:
+            value = uuid.UUID(raw)
+        except ValueError:
+            invalid.append(raw)
+            continue
+        # Ignorar ids repetidos conservando el primer lugar en que aparecen
+        requested.setdefault(value, None)
+    requested = list(requested)
+
+    if invalid:
+        return Response(
+            {"error": f"Los siguientes ids no son válidos: {invalid}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    shape = request.query_params.get('shape', 'list')
+    if shape not in ['list', 'detail']:
+        return Response(
+            {"error": f"Formato no válido: {shape}. Opciones: ['list', 'detail']"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    serializer_class = ExerciseSerializer if shape == 'detail' else ExerciseListSerializer
+    fields, error = _parse_fields(request, serializer_class)
+    if error:
+        return error
+
+    # Se consultan también los inactivos para distinguirlos de los que no existen
+    queryset = Exercise.objects.filter(id__in=requested)
+    if fields:
+        queryset = queryset.only(*serializer_class.model_columns(fields), 'updated_at', 'is_active')
+
+    found = {exercise.id: exercise for exercise in queryset}
+    exercises = [found[i] for i in requested if i in found and found[i].is_active]
+    inactive = [str(i) for i in requested if i in found and not found[i].is_active]
+    missing = [str(i) for i in requested if i not in found]
+
+    # El ETag depende del orden pedido, del formato y de la versión de cada ejercicio
+    etag = _build_etag(
+        shape,
+        *(fields or []),
+        *(str(i) for i in requested),
+        *(f"{e.id}:{e.updated_at.isoformat()}" for e in exercises),
+        *(f"inactive:{i}" for i in inactive)
+    )
+    last_modified = max((int(e.updated_at.timestamp()) for e in exercises), default=None)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    serializer = serializer_class(exercises, many=True, fields=fields)
+
+    response = Response({
+        "results": serializer.data,
+        "missing": missing,
+        "inactive": inactive,
+    })
+    return _set_conditional_headers(response, etag, last_modified)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@cached_view('exercise-search')
 def exercise_search_by_name(request):
     name = request.query_params.get('name', '').strip()
 
@@ -63,12 +247,12 @@ def exercise_search_by_name(request):
         Q(name__icontains=name) & Q(is_active=True)
     )
 
-    serializer = ExerciseListSerializer(exercises, many=True)
-    return Response(serializer.data)
+    return _sparse_list_response(request, exercises)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_view('exercise-muscle-group')
 def exercise_list_by_muscle_group(request):
     muscles = request.query_params.getlist('muscle_group')
 
@@ -96,12 +280,12 @@ def exercise_list_by_muscle_group(request):
         is_active=True
     )
 
-    serializer = ExerciseListSerializer(exercises, many=True)
-    return Response(serializer.data)
+    return _sparse_list_response(request, exercises)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_view('exercise-difficulty')
 def exercise_list_by_difficulty(request):
     difficulties = request.query_params.getlist('difficulty')
 
@@ -128,12 +312,12 @@ def exercise_list_by_difficulty(request):
         is_active=True
     )
 
-    serializer = ExerciseListSerializer(exercises, many=True)
-    return Response(serializer.data)
+    return _sparse_list_response(request, exercises)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_view('exercise-equipment')
 def exercise_list_by_equipment(request):
     equipments = request.query_params.getlist('equipment')
 
@@ -160,5 +344,199 @@ def exercise_list_by_equipment(request):
         is_active=True
     )
 
-    serializer = ExerciseListSerializer(exercises, many=True)
-    return Response(serializer.data)
\ No newline at end of file
+    return _sparse_list_response(request, exercises)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@cached_view('exercise-joint')
+def exercise_list_by_joint(request):
+    joints = request.query_params.getlist('joint')
+
+    if len(joints) == 1 and ',' in joints[0]:
+        joints = [j.strip() for j in joints[0].split(',')]
+
+    joints = [j.strip().lower() for j in joints if j.strip()]
+
+    if not joints:
+        return Response(
+            {"error": "Necesitas ingresar al menos una articulación"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    angles = ExerciseJointAngle.objects.filter(joint__in=joints)
+
+    # Rango opcional sobre el ángulo ideal de las articulaciones pedidas
+    for param, lookup in [('min_angle', 'target__gte'), ('max_angle', 'target__lte')]:
+        value = request.query_params.get(param)
+        if value is None:
+            continue
+        try:
+            value = float(value)
+        except ValueError:
+            value = math.nan
+
+        # float() también acepta 'nan' e 'inf', que no son ángulos
+        if not math.isfinite(value):
+            return Response(
+                {"error": f"El parámetro {param} debe ser un número"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        angles = angles.filter(**{lookup: value})
+
+    exercises = Exercise.objects.filter(
+        id__in=angles.values('exercise_id'),
+        is_active=True
+    )
+
+    return _sparse_list_response(request, exercises)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def rep_result_ingest(request):
+    """
+    POST: Registra resultados de repeticiones; se guardan por lotes en segundo plano
+    """
+    records = request.data
+    if isinstance(records, dict):
+        records = records.get('results')
+
+    if not records or not isinstance(records, list):
+        return Response(
+            {"error": "Necesitas enviar al menos un resultado"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if len(records) > TELEMETRY_MAX_RECORDS:
+        return Response(
+            {"error": f"Solo puedes enviar hasta {TELEMETRY_MAX_RECORDS} resultados a la vez"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    serializer = RepResultSerializer(data=records, many=True)
+    serializer.is_valid(raise_exception=True)
+
+    # Validar todos los ejercicios con una sola consulta
+    exercise_ids = {r['exercise_id'] for r in serializer.validated_data}
+    found = set(Exercise.objects.filter(id__in=exercise_ids, is_active=True).values_list('id', flat=True))
+    invalid = [str(i) for i in exercise_ids - found]
+
+    if invalid:
+        return Response(
+            {"error": f"Los siguientes ejercicios no existen o no están activos: {invalid}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    user_sub = str(get_token_payload(request).get('sub', ''))
+    results = [RepResult(user_sub=user_sub, **r) for r in serializer.validated_data]
+
+    try:
+        get_buffer().add(results)
+    except BufferFull:
+        response = Response(
+            {"error": "El servicio está saturado, intenta de nuevo más tarde."},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+        response['Retry-After'] = '5'
+        return response
+
+    return Response({"accepted": len(results)}, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@cached_view('exercise-stats', timeout=60)
+def exercise_stats(request):
+    """
+    GET: Errores más frecuentes y desviación promedio por articulación de cada ejercicio,
+    calculados a partir de los agregados diarios
+    """
+    days = request.query_params.get('days', STATS_DEFAULT_DAYS)
+    try:
+        days = int(days)
+    except (TypeError, ValueError):
+        days = 0
+
+    if not 1 <= days <= STATS_MAX_DAYS:
+        return Response(
+            {"error": f"El número de días debe estar entre 1 y {STATS_MAX_DAYS}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    rollups = ExerciseDailyRollup.objects.filter(
+        day__gte=timezone.now().date() - timedelta(days=days - 1),
+        exercise__is_active=True
+    )
+
+    exercise_ids = request.query_params.getlist('exercise')
+    if len(exercise_ids) == 1 and ',' in exercise_ids[0]:
+        exercise_ids = [e.strip() for e in exercise_ids[0].split(',')]
+
+    if exercise_ids:
+        try:
+            exercise_ids = [uuid.UUID(e) for e in exercise_ids]
+        except ValueError:
+            return Response(
+                {"error": "Los ids de ejercicio no son válidos"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        rollups = rollups.filter(exercise_id__in=exercise_ids)
+
+    difficulties = request.query_params.getlist('difficulty')
+    if len(difficulties) == 1 and ',' in difficulties[0]:
+        difficulties = [d.strip() for d in difficulties[0].split(',')]
+
+    if difficulties:
+        valid_diff = [choice[0] for choice in Exercise.DIFFICULTY]
+        invalid = [d for d in difficulties if d not in valid_diff]
+
+        if invalid:
+            return Response(
+                {"error": f"Dificultades no válidas: {invalid}. Opciones: {valid_diff}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        rollups = rollups.filter(exercise__difficulty__in=difficulties)
+
+    rows = rollups.values(
+        'exercise_id', 'exercise__name', 'exercise__difficulty', 'kind', 'label'
+    ).annotate(count=Sum('count'), total=Sum('total')).order_by()
+
+    stats = {}
+    mistakes = defaultdict(list)
+    for row in rows:
+        exercise_id = row['exercise_id']
+        entry = stats.setdefault(exercise_id, {
+            "exercise_id": str(exercise_id),
+            "name": row['exercise__name'],
+            "difficulty": row['exercise__difficulty'],
+            "reps": 0,
+            "joints": [],
+            "top_mistakes": [],
+        })
+
+        if row['kind'] == 'reps':
+            entry['reps'] = row['count']
+        elif row['kind'] == 'joint':
+            entry['joints'].append({
+                "joint": row['label'],
+                "avg_deviation": round(row['total'] / row['count'], 2) if row['count'] else None,
+                "samples": row['count'],
+            })
+        else:
+            mistakes[exercise_id].append({"mistake": row['label'], "count": row['count']})
+
+    for exercise_id, entry in stats.items():
+        entry['joints'].sort(key=lambda j: j['joint'])
+        entry['top_mistakes'] = sorted(mistakes[exercise_id], key=lambda m: -m['count'])[:5]
+
+    return Response({"days": days, "results": list(stats.values())})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def exercise_cache_stats(request):
+    """
+    GET: Métricas de la cache de respuestas del proceso (aciertos y tiempo de recálculo)
+    """
+    return Response(get_cache_stats())
@@ -46,6 +46,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'exercises.middleware.AdmissionControlMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -90,6 +91,18 @@ DATABASES = {
 }
 
 
+# Cache compartida por las vistas de lectura (ver exercises/cache.py)
+# Debe ser compartida entre workers e instancias para que una escritura invalide las respuestas
+# de todos; por defecto usa la base de datos (tabla creada con createcachetable, ver Dockerfile).
+# Con un backend local del proceso (LocMemCache) las vistas no usan la cache.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'exercises_cache'),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -130,6 +143,22 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'sub',
 }
 
+# Control de admisión para las rutas de ejercicios (ver exercises/middleware.py)
+ADMISSION_CONTROL = {
+    'BACKEND': os.getenv('ADMISSION_BACKEND', 'local'),
+    # Debe coincidir con los hilos por worker de gunicorn (GUNICORN_THREADS en el Dockerfile)
+    'MAX_CONCURRENT': int(os.getenv('ADMISSION_MAX_CONCURRENT', os.getenv('GUNICORN_THREADS', '8'))),
+    'RATE': float(os.getenv('ADMISSION_RATE', '10')),
+    'BURST': int(os.getenv('ADMISSION_BURST', '30')),
+}
+
+# Buffer de resultados de repeticiones (ver exercises/telemetry.py)
+TELEMETRY_BUFFER = {
+    'BATCH_SIZE': int(os.getenv('TELEMETRY_BATCH_SIZE', '500')),
+    'FLUSH_INTERVAL': float(os.getenv('TELEMETRY_FLUSH_INTERVAL', '2')),
+    'MAX_BUFFER': int(os.getenv('TELEMETRY_MAX_BUFFER', '20000')),
+}
+
 # Configuración de Cloudinary
 CLOUDINARY_STORAGE = {
     'CLOUD_NAME': config('CLOUDINARY_CLOUD_NAME', default=''),
@@ -137,6 +166,10 @@ CLOUDINARY_STORAGE = {
     'API_SECRET': config('CLOUDINARY_API_SECRET', default=''),
 }
 
+# Almacenamiento de imágenes de ejercicios (ver exercises/images.py)
+EXERCISE_IMAGE_STORAGE = os.getenv('EXERCISE_IMAGE_STORAGE', 'exercises.images.CloudinaryImageStorage')
+EXERCISE_IMAGE_WORKERS = int(os.getenv('EXERCISE_IMAGE_WORKERS', '2'))
+
 # Storage por defecto para archivos media
 DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 